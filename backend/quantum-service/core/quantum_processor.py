@@ -1,12 +1,63 @@
 import asyncio
+import itertools
+import time
+from functools import lru_cache
+from types import MappingProxyType
 import numpy as np
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
 import structlog
 
+from ._qaoa_kernels import qubo_energies
+
 logger = structlog.get_logger()
 
+# Offload QUBO energy evaluation to the GPU above this many shot-asset bits
+GPU_ENERGY_THRESHOLD = 100_000
+
+@lru_cache(maxsize=1)
+def _get_cupy():
+    """Import CuPy once, returning None when no GPU stack is installed"""
+    try:
+        import cupy
+        return cupy
+    except ImportError:
+        logger.warning("CuPy not installed, evaluating QUBO energies on CPU")
+        return None
+
+def _qubo_energies_gpu(bits: np.ndarray, covariance: np.ndarray, returns: np.ndarray,
+                       risk_tolerance: float) -> np.ndarray:
+    """Evaluate QUBO energies on the GPU, falling back to the CPU kernel"""
+    cp = _get_cupy()
+    if cp is None:
+        return qubo_energies(bits, covariance, returns, risk_tolerance)
+    
+    z = cp.asarray(bits, dtype=cp.float32)
+    cov = cp.asarray(covariance, dtype=cp.float32)
+    mu = cp.asarray(returns, dtype=cp.float32)
+    energies = ((z @ cov) * z).sum(axis=1) - risk_tolerance * (z @ mu)
+    return cp.asnumpy(energies)
+
+@lru_cache(maxsize=128)
+def _build_qaoa_circuit(assets: Tuple, returns: Tuple, covariance: Tuple,
+                        risk_tolerance: float) -> MappingProxyType:
+    """Build the QAOA portfolio circuit description; read-only, as cache hits share it"""
+    # Quantum Approximate Optimization Algorithm (QAOA) for portfolio
+    n_assets = len(assets)
+    
+    return MappingProxyType({
+        'algorithm': 'QAOA',
+        'qubits': n_assets * 2,  # Need extra qubits for constraints
+        'parameters': MappingProxyType({
+            'assets': assets,
+            'returns': returns,
+            'covariance': covariance,
+            'risk_tolerance': risk_tolerance
+        }),
+        'shots': 8192,  # Number of quantum measurements
+        'optimization_level': 3
+    })
+
 class QuantumProcessorInterface(ABC):
     """Base interface for quantum computing providers"""
     
@@ -15,12 +66,25 @@ class QuantumProcessorInterface(ABC):
         self.endpoint = endpoint
         self.api_key = api_key
         self.active_jobs = {}
+        self.poll_interval = 1.0  # Shared status poll cadence in seconds
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._poller_task: Optional[asyncio.Task] = None
+        self._epoch_ms = int(time.time() * 1000)
+        self._id_counter = itertools.count()
+        self._rng = np.random.default_rng()
         
     @abstractmethod
     async def submit_quantum_job(self, quantum_circuit: Dict) -> str:
         """Submit quantum job and return job ID"""
         pass
     
+    async def submit_quantum_job_batch(self, quantum_circuits: List[Dict]) -> List[str]:
+        """Submit several quantum jobs and return their job IDs in order"""
+        # Providers with a native batch endpoint override this with one request
+        return list(await asyncio.gather(
+            *(self.submit_quantum_job(circuit) for circuit in quantum_circuits)
+        ))
+    
     @abstractmethod
     async def get_job_status(self, job_id: str) -> Dict:
         """Get quantum job status"""
@@ -31,95 +95,162 @@ class QuantumProcessorInterface(ABC):
         """Fetch quantum computation results"""
         pass
     
-    async def quantum_portfolio_optimization(self, portfolio_data: Dict) -> Dict:
+    async def quantum_portfolio_optimization(self, portfolio_data: Dict,
+                                             submitter: Optional['BatchedSubmitter'] = None) -> Dict:
         """Quantum-enhanced portfolio optimization"""
         try:
             # Create quantum circuit for optimization
             quantum_circuit = self._create_optimization_circuit(portfolio_data)
             
-            # Submit to quantum processor
-            job_id = await self.submit_quantum_job(quantum_circuit)
+            # Submit to quantum processor, coalescing with concurrent requests if batching
+            if submitter is not None:
+                job_id = await submitter.submit(quantum_circuit)
+            else:
+                job_id = await self.submit_quantum_job(quantum_circuit)
             
-            # Wait for completion
-            result = await self._wait_for_completion(job_id)
+            # Peek once right after submission; fast jobs skip the poller entirely
+            status = await self.get_job_status(job_id)
+            if status['state'] == 'COMPLETED':
+                result = await self.fetch_results(job_id)
+            else:
+                # Wait for completion
+                result = await self._wait_for_completion(job_id)
             
             # Parse optimization results
-            optimized_portfolio = self._parse_optimization_results(result)
+            optimized_portfolio = self._parse_optimization_results(result, portfolio_data)
             
             return {
                 'optimized_weights': optimized_portfolio['weights'],
                 'expected_return': optimized_portfolio['return'],
                 'risk_level': optimized_portfolio['risk'],
                 'quantum_advantage': optimized_portfolio['speedup'],
-                'computation_time': optimized_portfolio['time']
+                'computation_time': optimized_portfolio['time'],
+                'ground_state_energy': optimized_portfolio['energy']
             }
             
         except Exception as e:
             logger.error("Quantum portfolio optimization failed", error=str(e))
             raise
     
-    def _create_optimization_circuit(self, portfolio_data: Dict) -> Dict:
+    def _create_optimization_circuit(self, portfolio_data: Dict) -> MappingProxyType:
         """Create quantum circuit for portfolio optimization"""
-        # Quantum Approximate Optimization Algorithm (QAOA) for portfolio
-        n_assets = len(portfolio_data['assets'])
-        
-        return {
-            'algorithm': 'QAOA',
-            'qubits': n_assets * 2,  # Need extra qubits for constraints
-            'parameters': {
-                'assets': portfolio_data['assets'],
-                'returns': portfolio_data['expected_returns'],
-                'covariance': portfolio_data['covariance_matrix'],
-                'risk_tolerance': portfolio_data['risk_tolerance']
-            },
-            'shots': 8192,  # Number of quantum measurements
-            'optimization_level': 3
-        }
+        # Circuits depend only on the QUBO inputs, so rebalances with an
+        # unchanged universe and statistics reuse the cached template
+        return _build_qaoa_circuit(
+            tuple(portfolio_data['assets']),
+            tuple(portfolio_data['expected_returns']),
+            tuple(map(tuple, portfolio_data['covariance_matrix'])),
+            portfolio_data['risk_tolerance']
+        )
     
-    async def _wait_for_completion(self, job_id: str, timeout: int = 300) -> Dict:
-        """Wait for quantum job completion"""
-        start_time = datetime.utcnow()
-        
-        while (datetime.utcnow() - start_time).seconds < timeout:
-            status = await self.get_job_status(job_id)
+    def _register_completion(self, job_id: str) -> asyncio.Future:
+        """Register a completion future for a submitted job"""
+        fut = self._pending.get(job_id)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[job_id] = fut
+        
+        # One shared poller per processor serves every pending job
+        if self._poller_task is None or self._poller_task.done():
+            self._poller_task = asyncio.create_task(self._poll_pending_jobs())
+        
+        return fut
+    
+    async def _poll_pending_jobs(self):
+        """Poll status for all pending jobs and resolve their futures"""
+        while self._pending:
+            job_ids = list(self._pending)
+            statuses = await asyncio.gather(
+                *(self.get_job_status(job_id) for job_id in job_ids),
+                return_exceptions=True
+            )
             
-            if status['state'] == 'COMPLETED':
-                return await self.fetch_results(job_id)
-            elif status['state'] == 'ERROR':
-                raise Exception(f"Quantum job failed: {status['error']}")
+            for job_id, status in zip(job_ids, statuses):
+                fut = self._pending.get(job_id)
+                if fut is None or fut.done():
+                    self._pending.pop(job_id, None)
+                    continue
+                
+                if isinstance(status, Exception):
+                    outcome = status
+                elif status['state'] == 'COMPLETED':
+                    try:
+                        outcome = await self.fetch_results(job_id)
+                    except Exception as e:
+                        outcome = e
+                elif status['state'] == 'ERROR':
+                    outcome = Exception(f"Quantum job failed: {status['error']}")
+                else:
+                    continue
+                
+                self._pending.pop(job_id, None)
+                if fut.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    fut.set_exception(outcome)
+                else:
+                    fut.set_result(outcome)
             
-            await asyncio.sleep(5)  # Check every 5 seconds
+            if self._pending:
+                await asyncio.sleep(self.poll_interval)
+    
+    async def _wait_for_completion(self, job_id: str, timeout: int = 300) -> Dict:
+        """Wait for quantum job completion"""
+        fut = self._register_completion(job_id)
         
-        raise TimeoutError("Quantum computation timeout")
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Quantum computation timeout")
+        finally:
+            self._pending.pop(job_id, None)
     
-    def _parse_optimization_results(self, raw_results: Dict) -> Dict:
+    def _parse_optimization_results(self, raw_results: Dict,
+                                    portfolio_data: Optional[Dict] = None) -> Dict:
         """Parse quantum optimization results"""
-        # Extract quantum measurement results
-        measurements = raw_results['measurements']
+        # Extract quantum measurement results as a (shots, qubits) bit matrix
+        if 'measurements_packed' in raw_results:
+            measurements = np.unpackbits(
+                raw_results['measurements_packed'], axis=1, count=raw_results['n_qubits']
+            )
+        else:
+            measurements = np.asarray(raw_results['measurements'], dtype=np.uint8)
         
         # Use quantum results to determine optimal portfolio weights
         # This is a simplified implementation - real quantum optimization
         # would use more sophisticated algorithms
         
-        n_assets = len(measurements[0])
-        optimal_weights = []
-        
-        # Aggregate quantum measurements to find optimal solution
-        for i in range(n_assets):
-            weight = sum(m[i] for m in measurements) / len(measurements)
-            optimal_weights.append(weight)
-        
-        # Normalize weights
-        total_weight = sum(optimal_weights)
+        # Aggregate quantum measurements to find optimal solution; the
+        # per-shot mean cancels under normalization, so divide column sums once
+        col_sums = measurements.sum(axis=0, dtype=np.int64)
+        total_weight = col_sums.sum()
         if total_weight > 0:
-            optimal_weights = [w / total_weight for w in optimal_weights]
+            optimal_weights = col_sums / total_weight
+        else:
+            optimal_weights = col_sums.astype(np.float64)
+        
+        # Lowest QUBO energy among sampled bitstrings
+        energy = None
+        if portfolio_data is not None:
+            n_assets = len(portfolio_data['assets'])
+            if 0 < n_assets <= measurements.shape[1]:
+                bits = measurements[:, :n_assets]
+                evaluate = _qubo_energies_gpu if bits.size > GPU_ENERGY_THRESHOLD else qubo_energies
+                energies = evaluate(
+                    bits,
+                    np.asarray(portfolio_data['covariance_matrix'], dtype=np.float32),
+                    np.asarray(portfolio_data['expected_returns'], dtype=np.float32),
+                    portfolio_data['risk_tolerance']
+                )
+                energy = float(energies.min())
         
         return {
-            'weights': optimal_weights,
+            'weights': optimal_weights.tolist(),
             'return': 0.08,  # Mock expected return
             'risk': 0.12,    # Mock risk level
             'speedup': 1000, # Mock quantum speedup
-            'time': raw_results.get('execution_time', 0)
+            'time': raw_results.get('execution_time', 0),
+            'energy': energy
         }
 
 class IBMQuantumProcessor(QuantumProcessorInterface):
@@ -128,27 +259,44 @@ class IBMQuantumProcessor(QuantumProcessorInterface):
     async def submit_quantum_job(self, quantum_circuit: Dict) -> str:
         """Submit job to IBM Quantum"""
         # Mock implementation - would use IBM Qiskit SDK
-        job_id = f"ibm_job_{datetime.utcnow().timestamp()}"
+        job_id = f"ibm_job_{self._epoch_ms}_{next(self._id_counter)}"
         
         # Store job details
         self.active_jobs[job_id] = {
             'circuit': quantum_circuit,
-            'submitted_at': datetime.utcnow(),
+            'submitted_ns': time.monotonic_ns(),
             'status': 'RUNNING'
         }
         
         logger.info(f"Submitted quantum job to IBM Quantum: {job_id}")
         return job_id
     
+    async def submit_quantum_job_batch(self, quantum_circuits: List[Dict]) -> List[str]:
+        """Submit a batch of jobs to IBM Quantum in one request"""
+        # Mock implementation - would use a single Qiskit batch submission
+        submitted_ns = time.monotonic_ns()
+        job_ids = []
+        
+        for quantum_circuit in quantum_circuits:
+            job_id = f"ibm_job_{self._epoch_ms}_{next(self._id_counter)}"
+            self.active_jobs[job_id] = {
+                'circuit': quantum_circuit,
+                'submitted_ns': submitted_ns,
+                'status': 'RUNNING'
+            }
+            job_ids.append(job_id)
+        
+        logger.info(f"Submitted batch of {len(job_ids)} quantum jobs to IBM Quantum")
+        return job_ids
+    
     async def get_job_status(self, job_id: str) -> Dict:
         """Get IBM Quantum job status"""
-        if job_id not in self.active_jobs:
+        job = self.active_jobs.get(job_id)
+        if job is None:
             return {'state': 'NOT_FOUND'}
         
-        job = self.active_jobs[job_id]
-        
         # Simulate job completion after 30 seconds
-        elapsed = (datetime.utcnow() - job['submitted_at']).seconds
+        elapsed = (time.monotonic_ns() - job['submitted_ns']) / 1e9
         if elapsed > 30:
             job['status'] = 'COMPLETED'
         
@@ -164,13 +312,11 @@ class IBMQuantumProcessor(QuantumProcessorInterface):
         n_qubits = 8
         
         # Generate mock measurement results
-        measurements = []
-        for _ in range(n_shots):
-            measurement = [np.random.randint(0, 2) for _ in range(n_qubits)]
-            measurements.append(measurement)
+        measurements = self._rng.integers(0, 2, size=(n_shots, n_qubits), dtype=np.uint8)
         
         return {
-            'measurements': measurements,
+            'measurements_packed': np.packbits(measurements, axis=1),
+            'n_qubits': n_qubits,
             'execution_time': 25.3,
             'quantum_volume': 64,
             'error_rate': 0.001
@@ -181,24 +327,40 @@ class GoogleQuantumProcessor(QuantumProcessorInterface):
     
     async def submit_quantum_job(self, quantum_circuit: Dict) -> str:
         """Submit job to Google Quantum AI"""
-        job_id = f"google_job_{datetime.utcnow().timestamp()}"
+        job_id = f"google_job_{self._epoch_ms}_{next(self._id_counter)}"
         
         self.active_jobs[job_id] = {
             'circuit': quantum_circuit,
-            'submitted_at': datetime.utcnow(),
+            'submitted_ns': time.monotonic_ns(),
             'status': 'QUEUED'
         }
         
         logger.info(f"Submitted quantum job to Google Quantum AI: {job_id}")
         return job_id
     
+    async def submit_quantum_job_batch(self, quantum_circuits: List[Dict]) -> List[str]:
+        """Submit a batch of jobs to Google Quantum AI in one request"""
+        submitted_ns = time.monotonic_ns()
+        job_ids = []
+        
+        for quantum_circuit in quantum_circuits:
+            job_id = f"google_job_{self._epoch_ms}_{next(self._id_counter)}"
+            self.active_jobs[job_id] = {
+                'circuit': quantum_circuit,
+                'submitted_ns': submitted_ns,
+                'status': 'QUEUED'
+            }
+            job_ids.append(job_id)
+        
+        logger.info(f"Submitted batch of {len(job_ids)} quantum jobs to Google Quantum AI")
+        return job_ids
+    
     async def get_job_status(self, job_id: str) -> Dict:
         """Get Google Quantum job status"""
-        if job_id not in self.active_jobs:
+        job = self.active_jobs.get(job_id)
+        if job is None:
             return {'state': 'NOT_FOUND'}
-        
-        job = self.active_jobs[job_id]
-        elapsed = (datetime.utcnow() - job['submitted_at']).seconds
+        elapsed = (time.monotonic_ns() - job['submitted_ns']) / 1e9
         
         if elapsed > 20:
             job['status'] = 'COMPLETED'
@@ -213,21 +375,76 @@ class GoogleQuantumProcessor(QuantumProcessorInterface):
             raise ValueError("Job not found")
         
         # Mock Sycamore processor results
-        measurements = [[np.random.randint(0, 2) for _ in range(10)] for _ in range(10000)]
+        measurements = self._rng.integers(0, 2, size=(10000, 10), dtype=np.uint8)
         
         return {
-            'measurements': measurements,
+            'measurements_packed': np.packbits(measurements, axis=1),
+            'n_qubits': 10,
             'execution_time': 15.7,
             'fidelity': 0.997,
             'processor': 'Sycamore'
         }
 
+class BatchedSubmitter:
+    """Coalesces concurrent job submissions into batched provider requests"""
+    
+    BATCH_INTERVAL_MS = 10
+    MAX_BATCH = 900
+    
+    def __init__(self, processor: QuantumProcessorInterface):
+        self.processor = processor
+        self._pending_batch: List[Tuple[Dict, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def submit(self, quantum_circuit: Dict) -> str:
+        """Queue a circuit for the next batch and return its job ID"""
+        fut = asyncio.get_running_loop().create_future()
+        self._pending_batch.append((quantum_circuit, fut))
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        
+        return await fut
+    
+    async def _flush_loop(self):
+        """Flush accumulated submissions every batch interval"""
+        while self._pending_batch:
+            await asyncio.sleep(self.BATCH_INTERVAL_MS / 1000)
+            
+            batch = self._pending_batch[:self.MAX_BATCH]
+            del self._pending_batch[:self.MAX_BATCH]
+            
+            try:
+                job_ids = await self.processor.submit_quantum_job_batch(
+                    [circuit for circuit, _ in batch]
+                )
+            except Exception as e:
+                logger.error("Batched quantum submission failed", error=str(e))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            
+            for (_, fut), job_id in zip(batch, job_ids):
+                if not fut.done():
+                    fut.set_result(job_id)
+            
+            # A short reply must not leave the remaining submitters waiting forever
+            if len(job_ids) < len(batch):
+                error = RuntimeError(f"Provider returned {len(job_ids)} job IDs for {len(batch)} circuits")
+                logger.error("Batched quantum submission incomplete", error=str(error))
+                for _, fut in batch[len(job_ids):]:
+                    if not fut.done():
+                        fut.set_exception(error)
+
 class QuantumManager:
     """Manages multiple quantum computing providers"""
     
     def __init__(self):
         self.processors = {}
+        self.submitters: Dict[str, BatchedSubmitter] = {}
         self.load_balancer = None
+        self._primary: Optional[QuantumProcessorInterface] = None
         
     async def initialize(self, config: Dict):
         """Initialize quantum processors"""
@@ -249,6 +466,14 @@ class QuantumManager:
                 config['google_api_key']
             )
         
+        self.submitters = {
+            processor.provider_name: BatchedSubmitter(processor)
+            for processor in self.processors.values()
+        }
+        
+        # Bind the preferred processor once instead of probing the dict per request
+        self._primary = self.processors.get('ibm') or self.processors.get('google')
+        
         logger.info(f"Initialized {len(self.processors)} quantum processors")
     
     async def optimize_portfolio_quantum(self, portfolio_data: Dict) -> Dict:
@@ -260,7 +485,10 @@ class QuantumManager:
         processor = self._select_optimal_processor(portfolio_data)
         
         # Run quantum optimization
-        result = await processor.quantum_portfolio_optimization(portfolio_data)
+        result = await processor.quantum_portfolio_optimization(
+            portfolio_data,
+            submitter=self.submitters.get(processor.provider_name)
+        )
         result['processor_used'] = processor.provider_name
         
         return result
@@ -273,9 +501,6 @@ class QuantumManager:
         # - Problem requirements
         # - Cost optimization
         
-        if 'ibm' in self.processors:
-            return self.processors['ibm']
-        elif 'google' in self.processors:
-            return self.processors['google']
-        else:
+        if self._primary is None:
             raise RuntimeError("No suitable quantum processor available")
+        return self._primary
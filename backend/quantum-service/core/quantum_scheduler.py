@@ -1,13 +1,31 @@
 import asyncio
 import heapq
+import itertools
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Set
 from enum import Enum
 import structlog
 
 logger = structlog.get_logger()
 
+# Offset from the monotonic clock to the Unix epoch, captured once at import
+_MONOTONIC_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+# Baseline runtime estimates (seconds) keyed by upper-case algorithm name
+_BASE_TIMES = {
+    'QAOA': 30.0,
+    'VQE': 45.0,
+    'GROVER': 20.0
+}
+
+def _ns_to_iso(ns: Optional[int]) -> Optional[str]:
+    """Convert a monotonic ns timestamp to an ISO-8601 UTC string"""
+    if ns is None:
+        return None
+    return datetime.utcfromtimestamp((ns + _MONOTONIC_EPOCH_OFFSET_NS) / 1e9).isoformat()
+
 class JobPriority(Enum):
     LOW = 1
     NORMAL = 2
@@ -21,7 +39,7 @@ class JobStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
-@dataclass
+@dataclass(slots=True)
 class QuantumJob:
     """Quantum job representation"""
     job_id: str
@@ -29,28 +47,95 @@ class QuantumJob:
     problem_data: Dict
     priority: JobPriority
     user_id: str
-    submitted_at: datetime
+    submitted_ns: int  # time.monotonic_ns() at submission
     estimated_runtime: float  # in seconds
     quantum_requirements: Dict
     callback: Optional[Callable] = None
     status: JobStatus = JobStatus.QUEUED
     result: Optional[Dict] = None
     error_message: Optional[str] = None
-    started_at: Optional[datetime] = None
-    completed_at: Optional[datetime] = None
+    started_ns: Optional[int] = None
+    completed_ns: Optional[int] = None
+    sort_key: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Higher priority first, then earlier submission, packed into one int
+        self.sort_key = ((JobPriority.CRITICAL.value - self.priority.value) << 64) | self.submitted_ns
     
     def __lt__(self, other):
         """For priority queue ordering"""
-        if self.priority.value != other.priority.value:
-            return self.priority.value > other.priority.value  # Higher priority first
-        return self.submitted_at < other.submitted_at  # Earlier submission first
+        return self.sort_key < other.sort_key
+
+class _QueueRank:
+    """Submission-order ranks of one priority level's queued jobs via a Fenwick tree
+
+    Jobs take append-only slots, so add, discard and rank are O(log n); slots are
+    renumbered once dead ones outnumber the live ones.
+    """
+    
+    __slots__ = ('_tree', '_slots')
+    
+    def __init__(self):
+        self._tree: List[int] = [0]  # 1-based Fenwick tree of live-slot counts
+        self._slots: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def _prefix(self, i: int) -> int:
+        """Live jobs in slots 1..i"""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+    
+    def add(self, job_id: str):
+        """Append a job after every job already in this level"""
+        i = len(self._tree)
+        # Node i covers slots (i - lowbit(i), i]; the new slot itself is live
+        self._tree.append(self._prefix(i - 1) - self._prefix(i - (i & -i)) + 1)
+        self._slots[job_id] = i
+    
+    def discard(self, job_id: str):
+        """Remove a job if present"""
+        i = self._slots.pop(job_id, None)
+        if i is None:
+            return
+        n = len(self._tree)
+        while i < n:
+            self._tree[i] -= 1
+            i += i & -i
+        
+        if not self._slots:
+            self._tree = [0]
+        elif n > 2 * len(self._slots) + 64:
+            self._compact()
+    
+    def rank(self, job_id: str) -> Optional[int]:
+        """Number of live jobs ahead of job_id in this level, or None if absent"""
+        i = self._slots.get(job_id)
+        return None if i is None else self._prefix(i - 1)
+    
+    def _compact(self):
+        """Renumber live jobs into slots 1..n, keeping their order"""
+        ordered = sorted(self._slots, key=self._slots.__getitem__)
+        self._slots = {job_id: i for i, job_id in enumerate(ordered, 1)}
+        # Every slot is live, so each node holds the size of the range it covers
+        self._tree = [0] + [i & -i for i in range(1, len(ordered) + 1)]
 
 class ResourceAllocation:
     """Quantum resource allocation tracking"""
     
+    __slots__ = (
+        'processor_id', 'max_concurrent_jobs', 'execution_slots', 'running_jobs',
+        'total_queue_time', 'total_execution_time', 'jobs_completed'
+    )
+    
     def __init__(self, processor_id: str, max_concurrent_jobs: int = 5):
         self.processor_id = processor_id
         self.max_concurrent_jobs = max_concurrent_jobs
+        self.execution_slots = asyncio.Semaphore(max_concurrent_jobs)
         self.running_jobs: Dict[str, QuantumJob] = {}
         self.total_queue_time = 0.0
         self.total_execution_time = 0.0
@@ -78,8 +163,17 @@ class QuantumJobScheduler:
     def __init__(self):
         self.job_queue: List[QuantumJob] = []
         self.jobs: Dict[str, QuantumJob] = {}
+        # Queue-position index per priority level, highest priority first
+        self._queue_ranks: Dict[JobPriority, _QueueRank] = {
+            priority: _QueueRank() for priority in sorted(JobPriority, key=lambda p: p.value, reverse=True)
+        }
+        self._cancelled: Set[str] = set()   # Lazily deleted heap entries
+        self._job_tasks: Dict[str, asyncio.Task] = {}  # Execution tasks of dispatched jobs
         self.processors: Dict[str, ResourceAllocation] = {}
         self.scheduling_enabled = True
+        self._wakeup = asyncio.Event()  # Set whenever queue or capacity changes
+        self._epoch_ms = int(time.time() * 1000)
+        self._id_counter = itertools.count()
         self.performance_metrics = {
             'total_jobs_scheduled': 0,
             'total_jobs_completed': 0,
@@ -109,10 +203,10 @@ class QuantumJobScheduler:
                         callback: Optional[Callable] = None) -> str:
         """Submit quantum job to scheduler"""
         
-        job_id = f"qjob_{datetime.utcnow().timestamp()}_{len(self.jobs)}"
+        job_id = f"qjob_{self._epoch_ms}_{next(self._id_counter)}"
         
         # Estimate runtime based on problem complexity
-        estimated_runtime = await self._estimate_job_runtime(algorithm_type, problem_data)
+        estimated_runtime = self._estimate_job_runtime(algorithm_type.upper(), problem_data)
         
         job = QuantumJob(
             job_id=job_id,
@@ -120,7 +214,7 @@ class QuantumJobScheduler:
             problem_data=problem_data,
             priority=priority,
             user_id=user_id,
-            submitted_at=datetime.utcnow(),
+            submitted_ns=time.monotonic_ns(),
             estimated_runtime=estimated_runtime,
             quantum_requirements=quantum_requirements or {},
             callback=callback
@@ -128,7 +222,9 @@ class QuantumJobScheduler:
         
         # Add to queue and jobs registry
         heapq.heappush(self.job_queue, job)
+        self._queue_ranks[priority].add(job_id)
         self.jobs[job_id] = job
+        self._wakeup.set()
         
         self.performance_metrics['total_jobs_scheduled'] += 1
         
@@ -150,9 +246,9 @@ class QuantumJobScheduler:
             'status': job.status.value,
             'algorithm_type': job.algorithm_type,
             'priority': job.priority.name,
-            'submitted_at': job.submitted_at.isoformat(),
-            'started_at': job.started_at.isoformat() if job.started_at else None,
-            'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+            'submitted_at': _ns_to_iso(job.submitted_ns),
+            'started_at': _ns_to_iso(job.started_ns),
+            'completed_at': _ns_to_iso(job.completed_ns),
             'estimated_runtime': job.estimated_runtime,
             'queue_position': queue_position,
             'result': job.result,
@@ -168,13 +264,23 @@ class QuantumJobScheduler:
         if job.status in [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED]:
             return False
         
+        was_queued = job.status == JobStatus.QUEUED
         job.status = JobStatus.CANCELLED
-        job.completed_at = datetime.utcnow()
+        job.completed_ns = time.monotonic_ns()
+        
+        # Queued jobs are tombstoned and dropped when popped from the heap
+        if was_queued:
+            self._cancelled.add(job_id)
+            self._remove_queue_key(job)
+            
+            # Rebuild once tombstones dominate so the heap stays bounded
+            if len(self._cancelled) > len(self.job_queue) // 2:
+                self._compact_queue()
         
-        # Remove from queue if queued
-        if job in self.job_queue:
-            self.job_queue.remove(job)
-            heapq.heapify(self.job_queue)
+        # Stop a running job's execution so it frees its slot and cannot complete later
+        task = self._job_tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
         
         # Remove from processor if running
         for processor in self.processors.values():
@@ -182,6 +288,7 @@ class QuantumJobScheduler:
                 processor.remove_running_job(job_id)
                 break
         
+        self._wakeup.set()
         logger.info(f"Job {job_id} cancelled")
         return True
     
@@ -189,11 +296,13 @@ class QuantumJobScheduler:
         """Main scheduling loop"""
         while self.scheduling_enabled:
             try:
+                await self._wakeup.wait()
+                self._wakeup.clear()
                 await self._schedule_next_jobs()
-                await asyncio.sleep(1)  # Check every second
             except Exception as e:
                 logger.error("Scheduling loop error", error=str(e))
                 await asyncio.sleep(5)
+                self._wakeup.set()
     
     async def _schedule_next_jobs(self):
         """Schedule next available jobs to processors"""
@@ -217,14 +326,19 @@ class QuantumJobScheduler:
         while self.job_queue and len(jobs_to_schedule) < len(available_processors):
             job = heapq.heappop(self.job_queue)
             
-            if job.status == JobStatus.QUEUED:
-                # Check if job requirements match available processors
-                suitable_processor = await self._find_suitable_processor(job, available_processors)
-                if suitable_processor:
-                    jobs_to_schedule.append((job, suitable_processor))
-                    available_processors.remove(suitable_processor)
-                else:
-                    temp_queue.append(job)
+            # Lazily drop entries that were cancelled while queued
+            if job.status != JobStatus.QUEUED:
+                self._cancelled.discard(job.job_id)
+                continue
+            
+            # Check if job requirements match available processors
+            suitable_processor = self._find_suitable_processor(job, available_processors)
+            if suitable_processor:
+                jobs_to_schedule.append((job, suitable_processor))
+                available_processors.remove(suitable_processor)
+                self._remove_queue_key(job)
+            else:
+                temp_queue.append(job)
             
         # Put unscheduled jobs back in queue
         for job in temp_queue:
@@ -234,7 +348,7 @@ class QuantumJobScheduler:
         for job, (processor_id, processor) in jobs_to_schedule:
             await self._execute_job(job, processor_id)
     
-    async def _find_suitable_processor(self, job: QuantumJob, available_processors: List) -> Optional[tuple]:
+    def _find_suitable_processor(self, job: QuantumJob, available_processors: List) -> Optional[tuple]:
         """Find suitable processor for job based on requirements"""
         requirements = job.quantum_requirements
         
@@ -253,9 +367,8 @@ class QuantumJobScheduler:
         """Execute job on specified processor"""
         processor = self.processors[processor_id]
         
-        # Update job status
+        # Update job status; started_ns is stamped once an execution slot is held
         job.status = JobStatus.RUNNING
-        job.started_at = datetime.utcnow()
         
         # Add to processor's running jobs
         processor.add_running_job(job)
@@ -263,71 +376,77 @@ class QuantumJobScheduler:
         logger.info(f"Starting job {job.job_id} on processor {processor_id}")
         
         # Execute job asynchronously
-        asyncio.create_task(self._run_job_execution(job, processor_id))
+        self._job_tasks[job.job_id] = asyncio.create_task(self._run_job_execution(job, processor_id))
     
     async def _run_job_execution(self, job: QuantumJob, processor_id: str):
         """Run job execution and handle completion"""
-        try:
-            # Simulate job execution time
-            execution_time = min(job.estimated_runtime, 60)  # Cap at 60 seconds for demo
-            await asyncio.sleep(execution_time)
-            
-            # Simulate successful job completion
-            job.result = {
-                'algorithm': job.algorithm_type,
-                'optimal_weights': [0.3, 0.25, 0.25, 0.2],
-                'expected_return': 0.08,
-                'risk_level': 0.12,
-                'quantum_advantage': 2.5,
-                'execution_time': execution_time
-            }
-            
-            job.status = JobStatus.COMPLETED
-            job.completed_at = datetime.utcnow()
-            
-            # Update metrics
-            queue_time = (job.started_at - job.submitted_at).total_seconds()
-            execution_time_actual = (job.completed_at - job.started_at).total_seconds()
-            
-            processor = self.processors[processor_id]
-            processor.total_queue_time += queue_time
-            processor.total_execution_time += execution_time_actual
-            processor.jobs_completed += 1
-            
-            self.performance_metrics['total_jobs_completed'] += 1
-            
-            # Remove from processor's running jobs
-            processor.remove_running_job(job.job_id)
-            
-            # Call callback if provided
-            if job.callback:
-                try:
-                    await job.callback(job.result)
-                except Exception as e:
-                    logger.error(f"Job callback failed for {job.job_id}", error=str(e))
-            
-            logger.info(f"Job {job.job_id} completed successfully")
-            
-        except Exception as e:
-            # Handle job failure
-            job.status = JobStatus.FAILED
-            job.error_message = str(e)
-            job.completed_at = datetime.utcnow()
-            
-            processor = self.processors[processor_id]
-            processor.remove_running_job(job.job_id)
+        processor = self.processors[processor_id]
+        
+        # Bound in-flight executions per processor at the task layer
+        async with processor.execution_slots:
+            # Time waiting for the slot counts as queue time, not execution time
+            job.started_ns = time.monotonic_ns()
+            try:
+                # Simulate job execution time
+                execution_time = min(job.estimated_runtime, 60)  # Cap at 60 seconds for demo
+                await asyncio.sleep(execution_time)
+                
+                # Simulate successful job completion
+                job.result = {
+                    'algorithm': job.algorithm_type,
+                    'optimal_weights': [0.3, 0.25, 0.25, 0.2],
+                    'expected_return': 0.08,
+                    'risk_level': 0.12,
+                    'quantum_advantage': 2.5,
+                    'execution_time': execution_time
+                }
+                
+                job.status = JobStatus.COMPLETED
+                job.completed_ns = time.monotonic_ns()
+                
+                # Update metrics
+                queue_time = (job.started_ns - job.submitted_ns) / 1e9
+                execution_time_actual = (job.completed_ns - job.started_ns) / 1e9
+                
+                processor.total_queue_time += queue_time
+                processor.total_execution_time += execution_time_actual
+                processor.jobs_completed += 1
+                
+                self.performance_metrics['total_jobs_completed'] += 1
+                
+                # Remove from processor's running jobs
+                processor.remove_running_job(job.job_id)
+                self._wakeup.set()
+                
+                # Call callback if provided
+                if job.callback:
+                    try:
+                        await job.callback(job.result)
+                    except Exception as e:
+                        logger.error(f"Job callback failed for {job.job_id}", error=str(e))
+                
+                logger.info(f"Job {job.job_id} completed successfully")
+                
+            except Exception as e:
+                # Handle job failure
+                job.status = JobStatus.FAILED
+                job.error_message = str(e)
+                job.completed_ns = time.monotonic_ns()
+                
+                processor.remove_running_job(job.job_id)
+                self._wakeup.set()
+                
+                logger.error(f"Job {job.job_id} failed", error=str(e))
             
-            logger.error(f"Job {job.job_id} failed", error=str(e))
+            finally:
+                self._job_tasks.pop(job.job_id, None)
     
-    async def _estimate_job_runtime(self, algorithm_type: str, problem_data: Dict) -> float:
-        """Estimate job runtime based on algorithm and problem size"""
-        base_times = {
-            'QAOA': 30.0,
-            'VQE': 45.0,
-            'GROVER': 20.0
-        }
+    def _estimate_job_runtime(self, algorithm_type: str, problem_data: Dict) -> float:
+        """Estimate job runtime based on algorithm and problem size
         
-        base_time = base_times.get(algorithm_type.upper(), 30.0)
+        algorithm_type is expected to be upper-cased by the caller.
+        """
+        base_time = _BASE_TIMES.get(algorithm_type, 30.0)
         
         # Adjust based on problem size
         problem_size_factor = 1.0
@@ -338,12 +457,32 @@ class QuantumJobScheduler:
         
         return base_time * problem_size_factor
     
+    def _compact_queue(self):
+        """Drop cancelled tombstones from the job heap"""
+        self.job_queue = [job for job in self.job_queue if job.job_id not in self._cancelled]
+        heapq.heapify(self.job_queue)
+        self._cancelled.clear()
+    
+    def _remove_queue_key(self, job: QuantumJob):
+        """Drop a job from the queue-position index"""
+        self._queue_ranks[job.priority].discard(job.job_id)
+    
     def _get_queue_position(self, job_id: str) -> int:
         """Get position of job in queue"""
-        for i, job in enumerate(self.job_queue):
-            if job.job_id == job_id:
-                return i + 1
-        return -1
+        job = self.jobs.get(job_id)
+        if not job:
+            return -1
+        
+        rank = self._queue_ranks[job.priority].rank(job_id)
+        if rank is None:
+            return -1
+        
+        # Every queued job of a higher priority is ahead, then earlier submissions at this one
+        ahead = sum(
+            len(level) for priority, level in self._queue_ranks.items()
+            if priority.value > job.priority.value
+        )
+        return ahead + rank + 1
     
     async def get_scheduler_metrics(self) -> Dict:
         """Get scheduler performance metrics"""
@@ -362,7 +501,7 @@ class QuantumJobScheduler:
         return {
             'total_jobs_scheduled': self.performance_metrics['total_jobs_scheduled'],
             'total_jobs_completed': total_completed,
-            'jobs_in_queue': len(self.job_queue),
+            'jobs_in_queue': sum(len(level) for level in self._queue_ranks.values()),
             'average_queue_time': total_queue_time / max(total_completed, 1),
             'average_execution_time': total_execution_time / max(total_completed, 1),
             'processor_metrics': processor_metrics
@@ -372,6 +511,7 @@ class QuantumJobScheduler:
         """Gracefully shutdown scheduler"""
         logger.info("Shutting down quantum job scheduler")
         self.scheduling_enabled = False
+        self._wakeup.set()
         
         # Cancel all queued jobs
         for job in list(self.job_queue):
@@ -38,6 +38,7 @@ class Settings(BaseSettings):
     # Risk Calculation Settings
     var_confidence_levels: list = [0.95, 0.99]
     var_lookback_days: int = 252  # 1 year
+    var_importance_shift: float = 0.0  # std devs the Monte Carlo draws shift into the tail; 0 disables importance sampling
     stress_test_scenarios: list = [
         "interest_rate_shock",
         "credit_spread_widening", 
@@ -50,6 +51,13 @@ class Settings(BaseSettings):
     max_workers: int = 4
     calculation_timeout: int = 30
     cache_ttl: int = 300  # 5 minutes
+    returns_cache_ttl: int = 300  # seconds historical returns are reused for VaR
+    limit_check_concurrency: int = 16  # limit-check workers per sweep
+    var_calculation_concurrency: int = 16  # portfolios stored and limit-checked concurrently per VaR sweep
+    limit_check_page_size: int = 1000  # portfolios fetched per limit-check page
+    violation_history_max: int = 100000  # most recent limit violations kept in memory
+    position_state_max: int = 10000  # portfolios whose position aggregates are maintained between sweeps
+    position_state_ttl: int = 300  # seconds before maintained position aggregates are reseeded from a full fetch
     
     # External Services
     analytics_service_url: str = "http://localhost:8003"
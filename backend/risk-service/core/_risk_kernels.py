@@ -0,0 +1,375 @@
+import numpy as np
+from functools import lru_cache
+from typing import Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    logger.warning("Numba not installed, using NumPy risk kernels")
+
+try:
+    import cupy as cp
+    if cp.cuda.runtime.getDeviceCount() == 0:
+        raise RuntimeError("no CUDA device")
+except Exception:
+    cp = None
+    logger.warning("CuPy or a CUDA device not available, VaR batches run on the CPU")
+
+def _gini_numpy(w: np.ndarray) -> float:
+    """Gini coefficient of ascending-sorted weights"""
+    n = w.shape[0]
+    ranks = np.arange(n, 0, -1, dtype=np.float64)  # n+1-i for i = 1..n
+    return float((n + 1 - 2 * (ranks @ w)) / (n * w.sum()))
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _gini_numba(w):
+        """Gini coefficient of ascending-sorted weights in one pass"""
+        n = w.shape[0]
+        acc = 0.0
+        total = 0.0
+        for i in range(n):
+            acc += (n - i) * w[i]
+            total += w[i]
+        return (n + 1 - 2 * acc) / (n * total)
+
+def _diversification_numpy(w: np.ndarray) -> Tuple[float, float, float, float]:
+    """HHI, top-5 concentration, Gini and max weight via NumPy"""
+    hhi = float(w @ w)
+    w_sorted = np.sort(w)
+    return hhi, float(w_sorted[-5:].sum()), _gini_numpy(w_sorted), float(w_sorted[-1])
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _diversification_numba(w):
+        """HHI, top-5 concentration, Gini and max weight in one fused pass"""
+        n = w.shape[0]
+        hhi = 0.0
+        for i in range(n):
+            hhi += w[i] * w[i]
+        
+        # One ascending sort serves both CR5 and Gini
+        w_sorted = np.sort(w)
+        cr5 = 0.0
+        for i in range(max(0, n - 5), n):
+            cr5 += w_sorted[i]
+        
+        return hhi, cr5, _gini_numba(w_sorted), w_sorted[n - 1]
+
+def diversification_metrics(w: np.ndarray) -> Tuple[float, float, float, float]:
+    """Return (hhi, cr5, gini, max_weight) for float64 position weights"""
+    if w.shape[0] == 0 or not w.sum() > 0:
+        return 0.0, 0.0, 0.0, 0.0
+    
+    if njit is None:
+        return _diversification_numpy(w)
+    
+    hhi, cr5, gini, max_weight = _diversification_numba(w)
+    return float(hhi), float(cr5), float(gini), float(max_weight)
+
+def _grouped_exposures_numpy(codes: np.ndarray, minor_values: np.ndarray,
+                             n_groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group minor-unit value and position count for each code column"""
+    n_dims = codes.shape[1]
+    width = int(n_groups.max())
+    sums = np.zeros((n_dims, width), dtype=np.int64)
+    counts = np.zeros((n_dims, width), dtype=np.int64)
+    
+    # bincount weights accumulate in float64, exact for integer totals below 2**53
+    for d in range(n_dims):
+        size = int(n_groups[d])
+        sums[d, :size] = np.rint(np.bincount(codes[:, d], weights=minor_values, minlength=size))
+        counts[d, :size] = np.bincount(codes[:, d], minlength=size)
+    
+    return sums, counts
+
+if njit is not None:
+    @njit(cache=True)
+    def _grouped_exposures_numba(codes, minor_values, n_groups):
+        """Accumulate every dimension's group sums in a single pass over positions"""
+        n, n_dims = codes.shape
+        width = n_groups.max()
+        sums = np.zeros((n_dims, width), dtype=np.int64)
+        counts = np.zeros((n_dims, width), dtype=np.int64)
+        
+        for i in range(n):
+            value = minor_values[i]
+            for d in range(n_dims):
+                c = codes[i, d]
+                sums[d, c] += value
+                counts[d, c] += 1
+        
+        return sums, counts
+
+def grouped_exposures(codes: np.ndarray, minor_values: np.ndarray,
+                      n_groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return int64 (sums, counts) of shape (dims, max groups) for int32 codes of shape (positions, dims)"""
+    if njit is None:
+        return _grouped_exposures_numpy(codes, minor_values, n_groups)
+    
+    return _grouped_exposures_numba(
+        np.ascontiguousarray(codes, dtype=np.int32),
+        np.ascontiguousarray(minor_values, dtype=np.int64),
+        np.ascontiguousarray(n_groups, dtype=np.int64)
+    )
+
+def _scalar_limit_flags_numpy(inputs: np.ndarray, limits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Current values and breach flags for stacked scalar limit inputs"""
+    current = inputs.copy()
+    total = inputs[:, 2]
+    current[:, 3] = np.divide(inputs[:, 3], total, out=np.zeros_like(total), where=total > 0)
+    return current, (current > limits).astype(np.int8)
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _scalar_limit_flags_numba(inputs, limits):
+        """Per-portfolio leverage and limit comparisons, parallel over portfolios"""
+        n, n_limits = inputs.shape
+        current = np.empty((n, n_limits), dtype=np.float64)
+        flags = np.zeros((n, n_limits), dtype=np.int8)
+        
+        for p in prange(n):
+            for j in range(n_limits):
+                current[p, j] = inputs[p, j]
+            total = inputs[p, 2]
+            current[p, 3] = inputs[p, 3] / total if total > 0 else 0.0
+            
+            for j in range(n_limits):
+                if current[p, j] > limits[p, j]:
+                    flags[p, j] = 1
+        
+        return current, flags
+
+def scalar_limit_flags(inputs: np.ndarray, limits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (current, flags) for (portfolios, 5) inputs of VaR 95, VaR 99, total value,
+    notional exposure and duration; notional is replaced by the leverage ratio"""
+    if njit is None:
+        return _scalar_limit_flags_numpy(inputs, limits)
+    
+    return _scalar_limit_flags_numba(
+        np.ascontiguousarray(inputs, dtype=np.float64),
+        np.ascontiguousarray(limits, dtype=np.float64)
+    )
+
+def _tail_kth(n: int) -> Tuple[np.ndarray, float, float, int, int]:
+    """Partition indices, percentile positions and ES cutoffs for tail statistics of n returns"""
+    # np.percentile's linear method reads positions q * (n - 1)
+    pos_95 = 0.05 * (n - 1)
+    pos_99 = 0.01 * (n - 1)
+    cutoff_95 = int(0.05 * n)
+    cutoff_99 = int(0.01 * n)
+    
+    kth = {int(pos_95), min(int(pos_95) + 1, n - 1), int(pos_99), min(int(pos_99) + 1, n - 1)}
+    kth.update(c - 1 for c in (cutoff_95, cutoff_99) if c > 0)
+    return np.array(sorted(kth), dtype=np.int64), pos_95, pos_99, cutoff_95, cutoff_99
+
+def _credit_spread_impacts_numpy(factors: np.ndarray, spreads: np.ndarray, durations: np.ndarray,
+                                 market_values: np.ndarray, is_credit: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Spread changes and credit-only price impacts via broadcasting"""
+    spread_changes = np.outer(factors, spreads)
+    impacts = np.where(is_credit, -durations * (spread_changes / 100) * market_values, 0.0)
+    return spread_changes, impacts
+
+def _inflation_impacts_numpy(inflation_changes: np.ndarray, rate_changes: np.ndarray, durations: np.ndarray,
+                             market_values: np.ndarray, inflation_linked: np.ndarray) -> np.ndarray:
+    """Inflation-linked gains and rate-driven losses via broadcasting"""
+    return np.where(
+        inflation_linked,
+        inflation_changes[:, None] * market_values * 0.8,
+        -durations * rate_changes[:, None] * market_values
+    )
+
+if njit is not None:
+    @njit(cache=True)
+    def _credit_spread_impacts_numba(factors, spreads, durations, market_values, is_credit):
+        """Spread changes and impacts in one pass, skipping non-credit positions"""
+        n_params = factors.shape[0]
+        n = spreads.shape[0]
+        spread_changes = np.empty((n_params, n), dtype=np.float32)
+        impacts = np.zeros((n_params, n), dtype=np.float32)
+        hundred = np.float32(100.0)
+        
+        for p in range(n_params):
+            for i in range(n):
+                change = factors[p] * spreads[i]
+                spread_changes[p, i] = change
+                if is_credit[i]:
+                    impacts[p, i] = -durations[i] * (change / hundred) * market_values[i]
+        
+        return spread_changes, impacts
+    
+    @njit(cache=True)
+    def _inflation_impacts_numba(inflation_changes, rate_changes, durations, market_values, inflation_linked):
+        """Evaluate only the branch each position takes"""
+        n_params = inflation_changes.shape[0]
+        n = market_values.shape[0]
+        impacts = np.empty((n_params, n), dtype=np.float32)
+        linked_share = np.float32(0.8)
+        
+        for p in range(n_params):
+            for i in range(n):
+                if inflation_linked[i]:
+                    impacts[p, i] = inflation_changes[p] * market_values[i] * linked_share
+                else:
+                    impacts[p, i] = -durations[i] * rate_changes[p] * market_values[i]
+        
+        return impacts
+
+def credit_spread_impacts(factors: np.ndarray, spreads: np.ndarray, durations: np.ndarray,
+                          market_values: np.ndarray, is_credit: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return float32 (spread_changes, impacts) of shape (parameters, positions) for spread
+    increase factors; impacts are -duration x spread change (bp) x value on credit positions"""
+    if njit is None:
+        return _credit_spread_impacts_numpy(factors, spreads, durations, market_values, is_credit)
+    
+    return _credit_spread_impacts_numba(factors, spreads, durations, market_values, is_credit)
+
+def inflation_impacts(inflation_changes: np.ndarray, rate_changes: np.ndarray, durations: np.ndarray,
+                      market_values: np.ndarray, inflation_linked: np.ndarray) -> np.ndarray:
+    """Return float32 impacts of shape (parameters, positions): inflation-linked positions gain
+    80% of the inflation change, the rest lose duration x rate change"""
+    if njit is None:
+        return _inflation_impacts_numpy(inflation_changes, rate_changes, durations, market_values, inflation_linked)
+    
+    return _inflation_impacts_numba(inflation_changes, rate_changes, durations, market_values, inflation_linked)
+
+# Simulations per independently seeded stream, so parallel draws do not depend on thread scheduling
+MONTE_CARLO_CHUNK = 4096
+
+def partition_percentiles(values: np.ndarray, percentiles) -> np.ndarray:
+    """np.percentile (linear) values from one partition around each percentile's position"""
+    n = values.shape[0]
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (n - 1)
+    lo = positions.astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    part = np.partition(values, np.union1d(lo, hi))
+    return part[lo] + (part[hi] - part[lo]) * (positions - lo)
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _standard_normal_draws_numba(simulations, seed, chunk):
+        """Standard-normal draws filled in parallel, one reseeded stream per chunk"""
+        z = np.empty(simulations, dtype=np.float64)
+        n_chunks = (simulations + chunk - 1) // chunk
+        for c in prange(n_chunks):
+            np.random.seed(seed + c)
+            for i in range(c * chunk, min((c + 1) * chunk, simulations)):
+                z[i] = np.random.standard_normal()
+        return z
+
+def _importance_sampled_quantiles(z: np.ndarray, shift: float) -> Tuple[float, float]:
+    """5th and 1st percentiles of N(0, 1) from draws shifted to N(-shift, 1), keeping
+    only the lower-half tail window and weighting it by the likelihood ratio"""
+    y = z - shift
+    tail = np.sort(y[y < 0.0])
+    # phi(y) / phi(y + shift): down-weights the oversampled far tail
+    weights = np.exp(shift * tail + 0.5 * shift * shift)
+    cdf = np.cumsum(weights) / z.shape[0]
+    idx = np.minimum(np.searchsorted(cdf, (0.05, 0.01)), tail.shape[0] - 1)
+    return float(tail[idx[0]]), float(tail[idx[1]])
+
+@lru_cache(maxsize=32)
+def standard_normal_quantiles(simulations: int, seed: int,
+                              importance_shift: float = 0.0) -> Tuple[float, float, float, float]:
+    """(5th, 1st, 95th, 99th) percentiles of the seeded standard-normal draws; the draws
+    are fixed per (simulations, seed, shift), so they are generated and partitioned once"""
+    if njit is None:
+        z = np.random.default_rng(seed).standard_normal(simulations)
+    else:
+        z = _standard_normal_draws_numba(simulations, seed, MONTE_CARLO_CHUNK)
+    
+    if importance_shift > 0:
+        # The normal is symmetric, so the upper quantiles mirror the lower ones
+        z_95, z_99 = _importance_sampled_quantiles(z, importance_shift)
+        return z_95, z_99, -z_95, -z_99
+    return tuple(float(q) for q in partition_percentiles(z, (5.0, 1.0, 95.0, 99.0)))
+
+# Batches of at least this many return cells run on the GPU when one is available
+GPU_MIN_CELLS = 1 << 26
+
+def batch_var_metrics(returns: np.ndarray, portfolio_values: np.ndarray, z_95: float, z_99: float,
+                      simulations: int, seed: int, importance_shift: float = 0.0) -> np.ndarray:
+    """Signed historical, parametric and Monte Carlo VaR plus expected shortfall for
+    (portfolios, days) returns from one partition; columns follow BATCH_VAR_COLUMNS.
+    A positive importance_shift (in standard deviations) importance-samples the Monte Carlo tail"""
+    n = returns.shape[1]
+    kth, pos_95, pos_99, cutoff_95, cutoff_99 = _tail_kth(n)
+    
+    # Large batches are bandwidth-bound, so they move to the GPU and only the
+    # (portfolios, metrics) result comes back to the host
+    on_gpu = cp is not None and returns.size >= GPU_MIN_CELLS
+    if on_gpu:
+        xp = cp
+        returns = cp.asarray(returns)
+        portfolio_values = cp.asarray(portfolio_values)
+        # CuPy partitions by sorting anyway, so sort the rows directly
+        part = cp.sort(returns, axis=1)
+    else:
+        xp = np
+        part = np.partition(returns, kth, axis=1)
+    
+    def quantile(pos):
+        lo = int(pos)
+        hi = min(lo + 1, n - 1)
+        return part[:, lo] + (part[:, hi] - part[:, lo]) * (pos - lo)
+    
+    def tail_mean(cutoff):
+        if cutoff == 0:
+            return xp.full(returns.shape[0], np.nan)
+        return part[:, :cutoff].mean(axis=1, dtype=xp.float64)
+    
+    mean_return = returns.mean(axis=1, dtype=xp.float64)
+    std_return = returns.std(axis=1, ddof=1, dtype=xp.float64)
+    sqrt_10 = np.sqrt(10.0)
+    
+    # One seeded draw serves both horizons (r_1d = mu + sigma*z, r_10d = 10*mu + sqrt(10)*sigma*z)
+    # and every portfolio; value is monotonic in z, so all read the same z quantiles,
+    # the upper ones when a negative portfolio value flips the order
+    z_lower_95, z_lower_99, z_upper_95, z_upper_99 = standard_normal_quantiles(simulations, seed, importance_shift)
+    long_book = portfolio_values >= 0
+    mc_z_95 = xp.where(long_book, z_lower_95, z_upper_95)
+    mc_z_99 = xp.where(long_book, z_lower_99, z_upper_99)
+    
+    hist_95 = quantile(pos_95)
+    hist_99 = quantile(pos_99)
+    
+    metrics = xp.column_stack([
+        hist_95,
+        hist_99,
+        hist_95 * sqrt_10,
+        hist_99 * sqrt_10,
+        mean_return + z_95 * std_return,
+        mean_return + z_99 * std_return,
+        mean_return * 10 + z_95 * std_return * sqrt_10,
+        mean_return * 10 + z_99 * std_return * sqrt_10,
+        mean_return + std_return * mc_z_95,
+        mean_return + std_return * mc_z_99,
+        mean_return * 10 + std_return * sqrt_10 * mc_z_95,
+        mean_return * 10 + std_return * sqrt_10 * mc_z_99,
+        tail_mean(cutoff_95),
+        tail_mean(cutoff_99)
+    ])
+    metrics = metrics * portfolio_values[:, None]
+    return cp.asnumpy(metrics) if on_gpu else metrics
+
+# Column order of batch_var_metrics
+BATCH_VAR_COLUMNS = (
+    'historical_var_95_1d', 'historical_var_99_1d',
+    'historical_var_95_10d', 'historical_var_99_10d',
+    'parametric_var_95_1d', 'parametric_var_99_1d',
+    'parametric_var_95_10d', 'parametric_var_99_10d',
+    'monte_carlo_var_95_1d', 'monte_carlo_var_99_1d',
+    'monte_carlo_var_95_10d', 'monte_carlo_var_99_10d',
+    'expected_shortfall_95', 'expected_shortfall_99'
+)
+
+def warm_up_var_kernels():
+    """Compile (or load from cache) the VaR kernels ahead of the first request"""
+    if njit is None:
+        return
+    
+    _standard_normal_draws_numba(100, 42, MONTE_CARLO_CHUNK)
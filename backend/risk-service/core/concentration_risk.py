@@ -1,36 +1,161 @@
+import asyncio
+import asyncpg
+import hashlib
 import numpy as np
+import orjson
 import pandas as pd
-from typing import Dict, List, Any, Optional
+import redis.asyncio as redis
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import structlog
 
+from ._risk_kernels import diversification_metrics, grouped_exposures
+
 logger = structlog.get_logger()
 
+# Columns fetched for each position
+POSITION_COLUMNS = [
+    'symbol', 'market_value', 'issuer', 'sector', 'rating', 'currency', 'maturity_date'
+]
+
+# Column defaults for positions missing classification data
+POSITION_DEFAULTS = {
+    'issuer': 'Unknown',
+    'sector': 'Unknown',
+    'rating': 'NR',
+    'currency': 'INR'
+}
+
+# Ordered credit rating scale; category code + 1 gives the numeric rating (AAA = 1 ... NR = 20)
+RATING_CAT = pd.CategoricalDtype([
+    'AAA', 'AA+', 'AA', 'AA-',
+    'A+', 'A', 'A-',
+    'BBB+', 'BBB', 'BBB-',
+    'BB+', 'BB', 'BB-',
+    'B+', 'B', 'B-',
+    'CCC+', 'CCC', 'CCC-',
+    'NR'
+], ordered=True)
+
+# Upper edges (years, inclusive) of the dated maturity buckets
+MATURITY_BUCKET_EDGES = np.array([1.0, 3.0, 5.0, 10.0])
+MATURITY_BUCKET_NAMES = ('0-1Y', '1-3Y', '3-5Y', '5-10Y', '10Y+', 'Perpetual')
+EXPOSURE_DIMENSIONS = ('issuer', 'sector', 'rating', 'currency')
+
+# Market values are aggregated as integer paise and converted back for reporting
+MINOR_UNITS = 100
+
+# Risk score weights for issuer, sector, rating, maturity and diversification
+RISK_SCORE_WEIGHTS = np.array([0.30, 0.25, 0.20, 0.15, 0.10])
+
+POSITIONS_QUERY = f"""
+    SELECT {', '.join(POSITION_COLUMNS)}
+    FROM positions
+    WHERE portfolio_id = $1
+    ORDER BY symbol
+"""
+
+# Market value (integer paise, rounded as _prepare_positions does) and position
+# counts per issuer, sector, rating and currency in a single scan; each row
+# belongs to exactly one grouping set, so the other dimension columns come back NULL
+EXPOSURE_QUERY = """
+    SELECT issuer, sector, rating, currency,
+           SUM(market_value_minor)::bigint AS market_value_minor,
+           COUNT(*) AS position_count,
+           COUNT(DISTINCT issuer) AS unique_issuers,
+           ARRAY_AGG(symbol ORDER BY symbol) AS instruments
+    FROM (
+        SELECT symbol,
+               ROUND(market_value::float8 * 100)::bigint AS market_value_minor,
+               COALESCE(issuer, 'Unknown') AS issuer,
+               COALESCE(sector, 'Unknown') AS sector,
+               COALESCE(rating, 'NR') AS rating,
+               COALESCE(currency, 'INR') AS currency
+        FROM positions
+        WHERE portfolio_id = $1
+    ) p
+    GROUP BY GROUPING SETS ((issuer), (sector), (rating), (currency))
+"""
+
 class ConcentrationRiskEngine:
     """Portfolio concentration risk analysis"""
     
     def __init__(self, settings):
         self.settings = settings
+        self.log = logger.bind(engine="concentration")
+        self.redis_client = None
+        self.db_pool = None
+        
+    async def initialize(self):
+        """Initialize position store and analysis result cache"""
+        try:
+            self.db_pool = await asyncpg.create_pool(
+                dsn=self.settings.risk_db_url,
+                min_size=2,
+                max_size=10
+            )
+        except Exception as e:
+            self.log.error("Failed to initialize concentration position pool", error=str(e))
+            raise
+        
+        self.redis_client = redis.Redis.from_url(self.settings.redis_url)
+        
+    async def close(self):
+        """Close database and cache connections"""
+        if self.db_pool:
+            await self.db_pool.close()
+        if self.redis_client:
+            await self.redis_client.close()
         
     async def analyze_portfolio(self, portfolio_id: str) -> Dict[str, Any]:
         """Comprehensive concentration risk analysis"""
         try:
-            positions = await self._get_portfolio_positions(portfolio_id)
-            if not positions:
+            positions, exposure_rows = await self._load_portfolio(portfolio_id)
+            if positions.empty:
                 return {"error": "No positions found"}
             
-            total_value = sum(pos['market_value'] for pos in positions)
+            # Results are keyed by portfolio and a hash of its positions, so any
+            # position change misses the cache without explicit invalidation
+            cache_key = self._analysis_cache_key(portfolio_id, positions)
+            cached = await self._get_cached_analysis(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Columnar view shared by the grouped aggregations
+            df = self._prepare_positions(positions)
+            as_of = datetime.utcnow()
+            total_value = int(df['market_value_minor'].sum()) / MINOR_UNITS
+            if total_value <= 0:
+                return {"error": "Portfolio has no positive market value"}
+            
+            # Helpers turn market values into percentages with one multiply
+            pct_scale = 100.0 / total_value
+            if exposure_rows is not None:
+                exposures = self._exposures_from_rows(exposure_rows, df)
+            else:
+                exposures = self._aggregate_exposures(df)
+            
+            # Helpers are independent and spend their time in pandas/NumPy C code,
+            # so run them on worker threads rather than on the event loop
+            (issuer, sector, rating, maturity, currency, diversification) = await asyncio.gather(
+                asyncio.to_thread(self._analyze_issuer_concentration, exposures['issuer'], pct_scale),
+                asyncio.to_thread(self._analyze_sector_concentration, exposures['sector'], pct_scale),
+                asyncio.to_thread(self._analyze_rating_concentration, exposures['rating'], pct_scale),
+                asyncio.to_thread(self._analyze_maturity_concentration, df, pct_scale, as_of),
+                asyncio.to_thread(self._analyze_currency_concentration, exposures['currency'], pct_scale),
+                asyncio.to_thread(self._calculate_diversification_metrics, df)
+            )
             
             analysis = {
                 'portfolio_id': portfolio_id,
                 'total_value': total_value,
-                'analysis_timestamp': datetime.utcnow().isoformat(),
-                'concentration_by_issuer': self._analyze_issuer_concentration(positions, total_value),
-                'concentration_by_sector': self._analyze_sector_concentration(positions, total_value),
-                'concentration_by_rating': self._analyze_rating_concentration(positions, total_value),
-                'concentration_by_maturity': self._analyze_maturity_concentration(positions, total_value),
-                'concentration_by_currency': self._analyze_currency_concentration(positions, total_value),
-                'diversification_metrics': self._calculate_diversification_metrics(positions, total_value),
+                'analysis_timestamp': as_of,
+                'concentration_by_issuer': issuer,
+                'concentration_by_sector': sector,
+                'concentration_by_rating': rating,
+                'concentration_by_maturity': maturity,
+                'concentration_by_currency': currency,
+                'diversification_metrics': diversification,
                 'concentration_risk_score': 0.0,
                 'recommendations': []
             }
@@ -41,87 +166,178 @@ class ConcentrationRiskEngine:
             # Generate recommendations
             analysis['recommendations'] = self._generate_recommendations(analysis)
             
+            await self._cache_analysis(cache_key, analysis)
+            
             return analysis
             
         except Exception as e:
-            logger.error(f"Concentration analysis failed for {portfolio_id}", error=str(e))
+            self.log.error("Concentration analysis failed", portfolio_id=portfolio_id, error=str(e))
             return {"error": str(e)}
     
-    def _analyze_issuer_concentration(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
-        """Analyze concentration by issuer"""
-        issuer_exposure = {}
-        
-        for pos in positions:
-            issuer = pos.get('issuer', 'Unknown')
-            if issuer not in issuer_exposure:
-                issuer_exposure[issuer] = {
-                    'market_value': 0,
-                    'positions': 0,
-                    'instruments': []
-                }
+    @staticmethod
+    def _analysis_cache_key(portfolio_id: str, positions: pd.DataFrame) -> str:
+        """Cache key for a portfolio's concentration analysis"""
+        row_hashes = pd.util.hash_pandas_object(positions, index=False).to_numpy()
+        digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+        return f"concrisk:{portfolio_id}:{digest}"
+    
+    async def _get_cached_analysis(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Fetch a cached analysis, treating cache errors as misses"""
+        if not self.redis_client:
+            return None
+        
+        try:
+            cached = await self.redis_client.get(cache_key)
+            if not cached:
+                return None
             
-            issuer_exposure[issuer]['market_value'] += pos['market_value']
-            issuer_exposure[issuer]['positions'] += 1
-            issuer_exposure[issuer]['instruments'].append(pos['symbol'])
-        
-        # Calculate percentages and sort by exposure
-        issuer_analysis = []
-        for issuer, data in issuer_exposure.items():
-            percentage = (data['market_value'] / total_value) * 100 if total_value > 0 else 0
-            issuer_analysis.append({
-                'issuer': issuer,
-                'market_value': data['market_value'],
-                'percentage': percentage,
-                'position_count': data['positions'],
-                'instruments': data['instruments']
-            })
+            # orjson stores datetimes as ISO strings; restore the type a miss returns
+            analysis = orjson.loads(cached)
+            analysis['analysis_timestamp'] = datetime.fromisoformat(analysis['analysis_timestamp'])
+            return analysis
+        except Exception as e:
+            self.log.warning("Concentration cache read failed", error=str(e))
+            return None
+    
+    async def _cache_analysis(self, cache_key: str, analysis: Dict[str, Any]):
+        """Store an analysis for settings.cache_ttl seconds"""
+        if not self.redis_client:
+            return
         
-        issuer_analysis.sort(key=lambda x: x['market_value'], reverse=True)
+        try:
+            await self.redis_client.setex(
+                cache_key,
+                self.settings.cache_ttl,
+                orjson.dumps(analysis, option=orjson.OPT_SERIALIZE_NUMPY)
+            )
+        except Exception as e:
+            self.log.warning("Concentration cache write failed", error=str(e))
+    
+    @staticmethod
+    def _prepare_positions(positions: pd.DataFrame) -> pd.DataFrame:
+        """Apply column types and defaults to fetched positions"""
+        df = positions.copy()
+        df['market_value'] = df['market_value'].astype(np.float64)
+        
+        for column, default in POSITION_DEFAULTS.items():
+            df[column] = df[column].fillna(default)
+        
+        df['market_value_minor'] = np.rint(df['market_value'].to_numpy() * MINOR_UNITS).astype(np.int64)
+        
+        return df
+    
+    @staticmethod
+    def _exposures_from_rows(rows: List[Any], df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Per-dimension frames from grouping-sets rows, in the order _aggregate_exposures uses"""
+        records = {dimension: [] for dimension in EXPOSURE_DIMENSIONS}
+        for row in rows:
+            dimension = next(column for column in EXPOSURE_DIMENSIONS if row[column] is not None)
+            records[dimension].append(row)
+        
+        extra_columns = {'issuer': 'instruments', 'sector': 'unique_issuers'}
+        
+        exposures = {}
+        for dimension in EXPOSURE_DIMENSIONS:
+            dimension_rows = records[dimension]
+            frame = pd.DataFrame(
+                {
+                    'market_value': np.array([row['market_value_minor'] for row in dimension_rows],
+                                             dtype=np.int64) / MINOR_UNITS,
+                    'position_count': np.array([row['position_count'] for row in dimension_rows],
+                                               dtype=np.int64)
+                },
+                index=pd.Index([row[dimension] for row in dimension_rows], name=dimension)
+            )
+            if dimension in extra_columns:
+                column = extra_columns[dimension]
+                frame[column] = [row[column] for row in dimension_rows]
+            
+            # Same snapshot as df, so the group keys match; first-appearance order keeps ties stable
+            exposures[dimension] = frame.reindex(pd.unique(df[dimension]))
+        
+        return exposures
+    
+    @staticmethod
+    def _aggregate_exposures(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Group fetched positions by each exposure dimension in one kernel pass"""
+        factorized = [pd.factorize(df[column], sort=False) for column in EXPOSURE_DIMENSIONS]
+        codes = np.column_stack([dim_codes for dim_codes, _ in factorized]).astype(np.int32)
+        n_groups = np.array([len(uniques) for _, uniques in factorized], dtype=np.int64)
+        
+        sums, counts = grouped_exposures(codes, df['market_value_minor'].to_numpy(), n_groups)
+        
+        exposures = {}
+        for d, (column, (_, uniques)) in enumerate(zip(EXPOSURE_DIMENSIONS, factorized)):
+            size = len(uniques)
+            exposures[column] = pd.DataFrame(
+                {'market_value': sums[d, :size] / MINOR_UNITS, 'position_count': counts[d, :size]},
+                index=pd.Index(uniques, name=column)
+            )
+        
+        issuer_codes = codes[:, 0].astype(np.int64)
+        sector_codes = codes[:, 1].astype(np.int64)
+        n_issuers, n_sectors = int(n_groups[0]), int(n_groups[1])
+        
+        # Group codes follow factorize order, so sorted groupby lines up with the index
+        exposures['issuer']['instruments'] = df['symbol'].groupby(issuer_codes, sort=True).agg(list).to_list()
+        
+        # Distinct (sector, issuer) pairs counted per sector
+        sector_issuer_pairs = np.unique(sector_codes * n_issuers + issuer_codes)
+        exposures['sector']['unique_issuers'] = np.bincount(sector_issuer_pairs // n_issuers, minlength=n_sectors)
+        
+        return exposures
+    
+    def _analyze_issuer_concentration(self, exposure: pd.DataFrame, pct_scale: float) -> Dict[str, Any]:
+        """Analyze concentration by issuer"""
+        issuer_value = exposure['market_value']
+        issuer_count = exposure['position_count']
+        issuer_instruments = exposure['instruments']
+        
+        issuer_pct = issuer_value * pct_scale
+        
+        # Only the top issuers are reported, so avoid a full sort
+        top_issuers = issuer_value.nlargest(10)
+        issuer_analysis = [
+            {
+                'issuer': issuer,
+                'market_value': value,
+                'percentage': value * pct_scale,
+                'position_count': int(issuer_count[issuer]),
+                'instruments': issuer_instruments[issuer]
+            }
+            for issuer, value in top_issuers.items()
+        ]
         
         # Calculate concentration metrics
         top_5_concentration = sum(item['percentage'] for item in issuer_analysis[:5])
-        top_10_concentration = sum(item['percentage'] for item in issuer_analysis[:10])
+        top_10_concentration = sum(item['percentage'] for item in issuer_analysis)
         max_single_issuer = issuer_analysis[0]['percentage'] if issuer_analysis else 0
         
         return {
-            'top_issuers': issuer_analysis[:10],
-            'total_issuers': len(issuer_analysis),
+            'top_issuers': issuer_analysis,
+            'total_issuers': len(issuer_value),
             'max_single_issuer_pct': max_single_issuer,
             'top_5_concentration_pct': top_5_concentration,
             'top_10_concentration_pct': top_10_concentration,
-            'herfindahl_index': sum((item['percentage'] / 100) ** 2 for item in issuer_analysis)
+            'herfindahl_index': float(((issuer_pct / 100) ** 2).sum())
         }
     
-    def _analyze_sector_concentration(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
+    def _analyze_sector_concentration(self, exposure: pd.DataFrame, pct_scale: float) -> Dict[str, Any]:
         """Analyze concentration by sector"""
-        sector_exposure = {}
-        
-        for pos in positions:
-            sector = pos.get('sector', 'Unknown')
-            if sector not in sector_exposure:
-                sector_exposure[sector] = {
-                    'market_value': 0,
-                    'positions': 0,
-                    'issuers': set()
-                }
-            
-            sector_exposure[sector]['market_value'] += pos['market_value']
-            sector_exposure[sector]['positions'] += 1
-            sector_exposure[sector]['issuers'].add(pos.get('issuer', 'Unknown'))
+        sector_value = exposure['market_value'].sort_values(ascending=False, kind='stable')
+        sector_count = exposure['position_count']
+        sector_issuers = exposure['unique_issuers']
         
-        # Calculate percentages
-        sector_analysis = []
-        for sector, data in sector_exposure.items():
-            percentage = (data['market_value'] / total_value) * 100 if total_value > 0 else 0
-            sector_analysis.append({
+        sector_analysis = [
+            {
                 'sector': sector,
-                'market_value': data['market_value'],
-                'percentage': percentage,
-                'position_count': data['positions'],
-                'unique_issuers': len(data['issuers'])
-            })
-        
-        sector_analysis.sort(key=lambda x: x['market_value'], reverse=True)
+                'market_value': value,
+                'percentage': value * pct_scale,
+                'position_count': int(sector_count[sector]),
+                'unique_issuers': int(sector_issuers[sector])
+            }
+            for sector, value in sector_value.items()
+        ]
         
         return {
             'sector_breakdown': sector_analysis,
@@ -130,117 +346,74 @@ class ConcentrationRiskEngine:
             'herfindahl_index': sum((item['percentage'] / 100) ** 2 for item in sector_analysis)
         }
     
-    def _analyze_rating_concentration(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
+    def _analyze_rating_concentration(self, exposure: pd.DataFrame, pct_scale: float) -> Dict[str, Any]:
         """Analyze concentration by credit rating"""
-        rating_exposure = {}
-        rating_mapping = {
-            'AAA': 1, 'AA+': 2, 'AA': 3, 'AA-': 4,
-            'A+': 5, 'A': 6, 'A-': 7,
-            'BBB+': 8, 'BBB': 9, 'BBB-': 10,
-            'BB+': 11, 'BB': 12, 'BB-': 13,
-            'B+': 14, 'B': 15, 'B-': 16,
-            'CCC+': 17, 'CCC': 18, 'CCC-': 19,
-            'NR': 20
-        }
+        rating_value = exposure['market_value']
+        rating_count = exposure['position_count']
         
-        for pos in positions:
-            rating = pos.get('rating', 'NR')
-            if rating not in rating_exposure:
-                rating_exposure[rating] = {
-                    'market_value': 0,
-                    'positions': 0
-                }
-            
-            rating_exposure[rating]['market_value'] += pos['market_value']
-            rating_exposure[rating]['positions'] += 1
-        
-        # Calculate percentages and categorize
-        rating_analysis = []
-        investment_grade_value = 0
-        high_yield_value = 0
+        # Numeric rating scale (1 = AAA ... 20 = NR/unknown), mapped once per rating
+        rating_codes = pd.Categorical(exposure.index, dtype=RATING_CAT).codes.astype(np.int8) + 1
+        rating_codes[rating_codes == 0] = 20  # Unrecognised ratings score as NR
+        rating_numeric = pd.Series(rating_codes, index=exposure.index)
         
-        for rating, data in rating_exposure.items():
-            percentage = (data['market_value'] / total_value) * 100 if total_value > 0 else 0
-            
-            rating_analysis.append({
+        rating_analysis = [
+            {
                 'rating': rating,
-                'market_value': data['market_value'],
-                'percentage': percentage,
-                'position_count': data['positions'],
-                'rating_numeric': rating_mapping.get(rating, 20)
-            })
-            
-            # Categorize investment grade vs high yield
-            if rating_mapping.get(rating, 20) <= 10:  # BBB- and above
-                investment_grade_value += data['market_value']
-            else:
-                high_yield_value += data['market_value']
-        
+                'market_value': value,
+                'percentage': value * pct_scale,
+                'position_count': int(rating_count[rating]),
+                'rating_numeric': int(rating_numeric[rating])
+            }
+            for rating, value in rating_value.items()
+        ]
         rating_analysis.sort(key=lambda x: x['rating_numeric'])
         
+        # Categorize investment grade (BBB- and above) vs high yield
+        market_values = rating_value.to_numpy(dtype=np.float64)
+        rating_nums = rating_numeric.to_numpy()
+        investment_grade = rating_nums <= 10
+        investment_grade_value = float(market_values[investment_grade].sum())
+        high_yield_value = float(market_values[~investment_grade].sum())
+        
         # Calculate weighted average rating
-        total_rating_weight = sum(
-            data['market_value'] * rating_mapping.get(rating, 20)
-            for rating, data in rating_exposure.items()
-        )
-        weighted_avg_rating = total_rating_weight / total_value if total_value > 0 else 20
+        weighted_avg_rating = float(market_values @ rating_nums) * pct_scale / 100
         
         return {
             'rating_breakdown': rating_analysis,
-            'investment_grade_pct': (investment_grade_value / total_value) * 100 if total_value > 0 else 0,
-            'high_yield_pct': (high_yield_value / total_value) * 100 if total_value > 0 else 0,
+            'investment_grade_pct': investment_grade_value * pct_scale,
+            'high_yield_pct': high_yield_value * pct_scale,
             'weighted_avg_rating_numeric': weighted_avg_rating,
             'credit_quality_score': max(0, (20 - weighted_avg_rating) / 20 * 100)
         }
     
-    def _analyze_maturity_concentration(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
-        """Analyze concentration by maturity buckets"""
-        maturity_buckets = {
-            '0-1Y': {'market_value': 0, 'positions': 0},
-            '1-3Y': {'market_value': 0, 'positions': 0},
-            '3-5Y': {'market_value': 0, 'positions': 0},
-            '5-10Y': {'market_value': 0, 'positions': 0},
-            '10Y+': {'market_value': 0, 'positions': 0},
-            'Perpetual': {'market_value': 0, 'positions': 0}
-        }
+    def _analyze_maturity_concentration(self, df: pd.DataFrame, pct_scale: float,
+                                        as_of: datetime) -> Dict[str, Any]:
+        """Analyze concentration by maturity buckets as of the analysis timestamp"""
+        minor_values = df['market_value_minor'].to_numpy()
         
-        for pos in positions:
-            maturity_date = pos.get('maturity_date')
-            if not maturity_date:
-                bucket = 'Perpetual'
-            else:
-                try:
-                    if isinstance(maturity_date, str):
-                        maturity_date = datetime.fromisoformat(maturity_date.replace('Z', '+00:00'))
-                    
-                    years_to_maturity = (maturity_date - datetime.utcnow()).days / 365.25
-                    
-                    if years_to_maturity <= 1:
-                        bucket = '0-1Y'
-                    elif years_to_maturity <= 3:
-                        bucket = '1-3Y'
-                    elif years_to_maturity <= 5:
-                        bucket = '3-5Y'
-                    elif years_to_maturity <= 10:
-                        bucket = '5-10Y'
-                    else:
-                        bucket = '10Y+'
-                except:
-                    bucket = 'Perpetual'
-            
-            maturity_buckets[bucket]['market_value'] += pos['market_value']
-            maturity_buckets[bucket]['positions'] += 1
+        if 'maturity_date' in df:
+            maturity_dates = pd.to_datetime(df['maturity_date'], utc=True, errors='coerce', format='ISO8601')
+            years_to_maturity = ((maturity_dates - pd.Timestamp(as_of, tz='UTC')).dt.days / 365.25).to_numpy()
+        else:
+            years_to_maturity = np.full(len(df), np.nan)
+        
+        # Bucket ids 0-4 by maturity edges; missing or unparseable dates are Perpetual
+        bucket_idx = np.searchsorted(MATURITY_BUCKET_EDGES, years_to_maturity)
+        bucket_idx[np.isnan(years_to_maturity)] = len(MATURITY_BUCKET_NAMES) - 1
+        
+        n_buckets = len(MATURITY_BUCKET_NAMES)
+        bucket_value = np.bincount(bucket_idx, weights=minor_values, minlength=n_buckets) / MINOR_UNITS
+        bucket_count = np.bincount(bucket_idx, minlength=n_buckets)
         
         # Calculate percentages
         maturity_analysis = []
-        for bucket, data in maturity_buckets.items():
-            if data['market_value'] > 0:  # Only include non-empty buckets
-                percentage = (data['market_value'] / total_value) * 100
+        for bucket, value, count in zip(MATURITY_BUCKET_NAMES, bucket_value, bucket_count):
+            if value > 0:  # Only include non-empty buckets
                 maturity_analysis.append({
                     'maturity_bucket': bucket,
-                    'market_value': data['market_value'],
-                    'percentage': percentage,
-                    'position_count': data['positions']
+                    'market_value': float(value),
+                    'percentage': value * pct_scale,
+                    'position_count': int(count)
                 })
         
         maturity_analysis.sort(key=lambda x: x['market_value'], reverse=True)
@@ -251,33 +424,20 @@ class ConcentrationRiskEngine:
             'effective_buckets': len(maturity_analysis)
         }
     
-    def _analyze_currency_concentration(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
+    def _analyze_currency_concentration(self, exposure: pd.DataFrame, pct_scale: float) -> Dict[str, Any]:
         """Analyze concentration by currency"""
-        currency_exposure = {}
-        
-        for pos in positions:
-            currency = pos.get('currency', 'INR')
-            if currency not in currency_exposure:
-                currency_exposure[currency] = {
-                    'market_value': 0,
-                    'positions': 0
-                }
-            
-            currency_exposure[currency]['market_value'] += pos['market_value']
-            currency_exposure[currency]['positions'] += 1
+        currency_value = exposure['market_value'].sort_values(ascending=False, kind='stable')
+        currency_count = exposure['position_count']
         
-        # Calculate percentages
-        currency_analysis = []
-        for currency, data in currency_exposure.items():
-            percentage = (data['market_value'] / total_value) * 100 if total_value > 0 else 0
-            currency_analysis.append({
+        currency_analysis = [
+            {
                 'currency': currency,
-                'market_value': data['market_value'],
-                'percentage': percentage,
-                'position_count': data['positions']
-            })
-        
-        currency_analysis.sort(key=lambda x: x['market_value'], reverse=True)
+                'market_value': value,
+                'percentage': value * pct_scale,
+                'position_count': int(currency_count[currency])
+            }
+            for currency, value in currency_value.items()
+        ]
         
         return {
             'currency_breakdown': currency_analysis,
@@ -286,19 +446,21 @@ class ConcentrationRiskEngine:
             'currency_count': len(currency_analysis)
         }
     
-    def _calculate_diversification_metrics(self, positions: List[Dict], total_value: float) -> Dict[str, Any]:
+    def _calculate_diversification_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Calculate diversification metrics"""
         try:
-            n_positions = len(positions)
+            n_positions = len(df)
             
             if n_positions == 0:
                 return {}
             
             # Calculate position weights
-            weights = [pos['market_value'] / total_value for pos in positions if total_value > 0]
+            minor_values = df['market_value_minor'].to_numpy()
+            weights = minor_values / minor_values.sum()
             
-            # Herfindahl-Hirschman Index
-            hhi = sum(w**2 for w in weights)
+            # Herfindahl-Hirschman Index, top-5 concentration ratio and Gini
+            # coefficient (inequality measure) from one fused kernel pass
+            hhi, cr5, gini, max_weight = diversification_metrics(weights)
             
             # Effective number of holdings
             effective_holdings = 1 / hhi if hhi > 0 else 1
@@ -306,82 +468,46 @@ class ConcentrationRiskEngine:
             # Diversification ratio (1 = perfectly diversified, 0 = concentrated)
             diversification_ratio = (1 - hhi) / (1 - 1/n_positions) if n_positions > 1 else 0
             
-            # Concentration ratio (top 5 positions)
-            sorted_weights = sorted(weights, reverse=True)
-            cr5 = sum(sorted_weights[:min(5, len(sorted_weights))])
-            
-            # Gini coefficient (inequality measure)
-            gini = self._calculate_gini_coefficient(weights)
-            
             return {
                 'herfindahl_hirschman_index': hhi,
                 'effective_number_holdings': effective_holdings,
                 'diversification_ratio': diversification_ratio,
                 'concentration_ratio_5': cr5,
                 'gini_coefficient': gini,
+                'max_position_weight': max_weight,
                 'total_positions': n_positions,
                 'average_position_size_pct': (1 / n_positions) * 100 if n_positions > 0 else 0
             }
             
         except Exception as e:
-            logger.error("Failed to calculate diversification metrics", error=str(e))
+            self.log.error("Failed to calculate diversification metrics", error=str(e))
             return {}
     
-    def _calculate_gini_coefficient(self, weights: List[float]) -> float:
-        """Calculate Gini coefficient for position weights"""
-        try:
-            if not weights:
-                return 0.0
-            
-            weights = sorted(weights)
-            n = len(weights)
-            cumsum = np.cumsum(weights)
-            
-            return (n + 1 - 2 * sum((n + 1 - i) * w for i, w in enumerate(weights, 1))) / (n * sum(weights))
-            
-        except Exception as e:
-            logger.error("Gini coefficient calculation failed", error=str(e))
-            return 0.0
-    
     def _calculate_concentration_risk_score(self, analysis: Dict[str, Any]) -> float:
         """Calculate overall concentration risk score (0-100, higher = more concentrated)"""
         try:
-            score = 0.0
-            
-            # Issuer concentration (30% weight)
             max_issuer = analysis['concentration_by_issuer'].get('max_single_issuer_pct', 0)
-            issuer_score = min(max_issuer * 2, 100)  # 50% issuer = 100 score
-            score += issuer_score * 0.30
-            
-            # Sector concentration (25% weight)
             max_sector = analysis['concentration_by_sector'].get('max_sector_pct', 0)
-            sector_score = min(max_sector * 1.5, 100)  # 67% sector = 100 score
-            score += sector_score * 0.25
+            max_maturity = analysis['concentration_by_maturity'].get('max_bucket_pct', 0)
             
-            # Rating concentration (20% weight)
-            rating_hhi = analysis['concentration_by_rating'].get('rating_breakdown', [])
-            if rating_hhi:
-                rating_concentration = sum((item['percentage'] / 100) ** 2 for item in rating_hhi)
-                rating_score = rating_concentration * 100
-                score += rating_score * 0.20
+            rating_breakdown = analysis['concentration_by_rating'].get('rating_breakdown', [])
+            rating_concentration = sum((item['percentage'] / 100) ** 2 for item in rating_breakdown)
             
-            # Maturity concentration (15% weight)
-            max_maturity = analysis['concentration_by_maturity'].get('max_bucket_pct', 0)
-            maturity_score = min(max_maturity * 1.25, 100)  # 80% maturity bucket = 100 score
-            score += maturity_score * 0.15
+            # Inverted diversification ratio (1 = well diversified = low score)
+            div_ratio = (analysis['diversification_metrics'] or {}).get('diversification_ratio', 1.0)
             
-            # Diversification (10% weight)
-            diversification = analysis['diversification_metrics']
-            if diversification:
-                div_ratio = diversification.get('diversification_ratio', 1.0)
-                # Invert diversification ratio (1 = well diversified = low score)
-                div_score = (1 - div_ratio) * 100
-                score += div_score * 0.10
+            subscores = np.array([
+                max_issuer * 2,              # 50% issuer = 100 score
+                max_sector * 1.5,            # 67% sector = 100 score
+                rating_concentration * 100,
+                max_maturity * 1.25,         # 80% maturity bucket = 100 score
+                (1 - div_ratio) * 100
+            ])
             
-            return min(score, 100.0)
+            return float(np.clip(subscores, 0, 100) @ RISK_SCORE_WEIGHTS)
             
         except Exception as e:
-            logger.error("Concentration risk score calculation failed", error=str(e))
+            self.log.error("Concentration risk score calculation failed", error=str(e))
             return 50.0  # Default medium risk
     
     def _generate_recommendations(self, analysis: Dict[str, Any]) -> List[str]:
@@ -420,15 +546,33 @@ class ConcentrationRiskEngine:
                 recommendations.append("Portfolio concentration levels appear reasonable")
                 
         except Exception as e:
-            logger.error("Failed to generate recommendations", error=str(e))
+            self.log.error("Failed to generate recommendations", error=str(e))
             recommendations.append("Unable to generate recommendations due to calculation error")
         
         return recommendations
     
-    async def _get_portfolio_positions(self, portfolio_id: str) -> List[Dict]:
-        """Get portfolio positions (placeholder)"""
-        # This would fetch from database
-        return [
+    async def _load_portfolio(self, portfolio_id: str) -> Tuple[pd.DataFrame, Optional[List[Any]]]:
+        """Positions as a columnar DataFrame, plus their Postgres-grouped exposure rows when the store has them"""
+        if self.db_pool is not None:
+            try:
+                async with self.db_pool.acquire() as conn:
+                    # One repeatable-read snapshot, so the grouped exposures describe exactly these positions
+                    async with conn.transaction(isolation='repeatable_read', readonly=True):
+                        rows = await conn.fetch(POSITIONS_QUERY, portfolio_id)
+                        exposure_rows = await conn.fetch(EXPOSURE_QUERY, portfolio_id)
+                positions = pd.DataFrame.from_records(
+                    [tuple(row) for row in rows], columns=POSITION_COLUMNS
+                )
+                return positions, exposure_rows
+            except asyncpg.UndefinedTableError:
+                self.log.warning("Position store has no positions table, using placeholder positions")
+        
+        return self._placeholder_positions(), None
+    
+    @staticmethod
+    def _placeholder_positions() -> pd.DataFrame:
+        """Placeholder positions until the position store is wired up"""
+        return pd.DataFrame([
             {
                 'symbol': 'GSEC10Y',
                 'market_value': 25000000,
@@ -474,4 +618,4 @@ class ConcentrationRiskEngine:
                 'currency': 'INR',
                 'maturity_date': '2025-09-30'
             }
-        ]
+        ], columns=POSITION_COLUMNS)
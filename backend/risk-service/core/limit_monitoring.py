@@ -1,18 +1,126 @@
 import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
 import numpy as np
-from typing import Dict, List, Any, Optional
+import pandas as pd
+from typing import AsyncIterator, Collection, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import structlog
 
+from ._risk_kernels import scalar_limit_flags
+from .concentration_risk import MATURITY_BUCKET_EDGES
+
 logger = structlog.get_logger()
 
+# Concentration limit, position dimension and description label
+CONCENTRATION_LIMIT_DIMENSIONS = (
+    ('single_issuer', 'issuer', 'Single issuer'),
+    ('single_sector', 'sector', 'Single sector'),
+    ('single_rating', 'rating', 'Single rating'),
+    ('single_maturity_bucket', 'maturity_bucket', 'Single maturity bucket')
+)
+
+# Scalar limits in kernel column order: limit type, violation type, severity, description
+SCALAR_LIMITS = (
+    ('var_95_1d', 'var_limit_breach', 'high', 'VaR 95% ({:,.0f}) exceeds limit ({:,.0f})'),
+    ('var_99_1d', 'var_limit_breach', 'critical', 'VaR 99% ({:,.0f}) exceeds limit ({:,.0f})'),
+    ('total_portfolio', 'exposure_limit_breach', 'high', 'Total portfolio value ({:,.0f}) exceeds limit ({:,.0f})'),
+    ('leverage_ratio', 'exposure_limit_breach', 'high', 'Leverage ratio ({:.2f}) exceeds limit ({:.2f})'),
+    ('duration_limit', 'exposure_limit_breach', 'medium', 'Portfolio duration ({:.2f}) exceeds limit ({:.2f})')
+)
+
+# Limits group reported by get_portfolio_limits for each scalar limit
+SCALAR_LIMIT_GROUPS = ('var_limits', 'var_limits', 'exposure_limits', 'exposure_limits', 'exposure_limits')
+
+@dataclass(slots=True)
+class PositionAggregates:
+    """Position market value totals shared by the position-based limit checks"""
+    total: float
+    liquid: float
+    by_issuer: np.ndarray
+    by_sector: np.ndarray
+    by_rating: np.ndarray
+    by_maturity_bucket: np.ndarray
+    names: Dict[str, np.ndarray]
+
+# Maintained contribution of one position: market value, dimension codes, maturity bucket, liquid flag
+PositionEntry = Tuple[float, Tuple[int, ...], int, bool]
+
+@dataclass(slots=True)
+class PortfolioPositionState:
+    """A portfolio's position aggregates, kept current by position updates between full reseeds"""
+    aggregates: PositionAggregates
+    codes: Dict[str, Dict[str, int]]
+    positions: Dict[str, PositionEntry]
+    seeded_at: float
+
+# Sub-check currently running, reported by the outer guards when a check fails
+_current_check: contextvars.ContextVar[str] = contextvars.ContextVar('current_limit_check', default='')
+
+# Utilization status bands: <= 80% green, <= 100% yellow, above red
+LIMIT_STATUS_THRESHOLDS = np.array([80.0, 100.0])
+LIMIT_STATUS_LABELS = np.array(['green', 'yellow', 'red'])
+
+class _LazyDescription:
+    """Violation description formatted only when rendered by a log or alert sink"""
+    __slots__ = ('fmt', 'args')
+    
+    def __init__(self, fmt: str, args: tuple):
+        self.fmt = fmt
+        self.args = args
+    
+    def __str__(self) -> str:
+        return self.fmt.format(*self.args)
+    
+    __repr__ = __str__
+
+@dataclass(slots=True)
+class LimitViolation:
+    """A single limit breach found by a limit check"""
+    type: str
+    severity: str
+    limit_type: str
+    current_value: float
+    limit_value: float
+    utilization: float
+    description: _LazyDescription
+    top_exposures: Optional[List[Dict[str, Any]]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for logging and JSON serialization, with the description rendered"""
+        violation = asdict(self)
+        violation['description'] = str(self.description)
+        if self.top_exposures is None:
+            del violation['top_exposures']
+        return violation
+
+@dataclass(slots=True)
+class LimitViolationRecord:
+    """A handled violation as kept in the violation history"""
+    portfolio_id: str
+    timestamp: datetime
+    violation: LimitViolation
+
+# Concentration breaches on these dimensions also report their largest exposures
+TOP_EXPOSURE_DIMENSIONS = ('issuer', 'sector')
+TOP_EXPOSURE_COUNT = 5
+
+# Defaults for positions missing classification data
+POSITION_DIMENSION_DEFAULTS = {'issuer': 'Unknown', 'sector': 'Unknown', 'rating': 'NR'}
+
 class LimitMonitoringEngine:
     """Real-time risk limit monitoring and enforcement"""
     
     def __init__(self, settings):
         self.settings = settings
         self.active_limits = {}
-        self.violation_history = []
+        self.violation_history = deque(maxlen=settings.violation_history_max)
+        
+        # Maintained position state per portfolio, least recently used first and
+        # bounded by settings.position_state_max
+        self._position_states: OrderedDict[str, PortfolioPositionState] = OrderedDict()
         
     async def initialize(self):
         """Initialize limit monitoring engine"""
@@ -46,286 +154,502 @@ class LimitMonitoringEngine:
                 'days_to_liquidate_90pct': 30  # 30 days max
             }
         }
+        self._bind_limit_attributes()
+        
+    def _bind_limit_attributes(self):
+        """Flatten active limits into the scalars and tuples read on the check path"""
+        inf = float('inf')
+        exposure_limits = self.active_limits['exposure_limits']
+        concentration_limits = self.active_limits['concentration_limits']
+        
+        exposure_row = (
+            exposure_limits['total_portfolio'],
+            exposure_limits['leverage_ratio'],
+            exposure_limits['duration_limit']
+        )
+        
+        # Complete scalar limit row per portfolio type, in SCALAR_LIMITS column order,
+        # so the check path does one lookup per portfolio; unknown types have no VaR limits
+        self._scalar_limit_rows = {
+            portfolio_type: (limits.get('var_95_1d', inf), limits.get('var_99_1d', inf)) + exposure_row
+            for portfolio_type, limits in self.active_limits['var_limits'].items()
+        }
+        self._default_scalar_limit_row = (inf, inf) + exposure_row
+        self._concentration_checks = tuple(
+            (limit_type, dimension, label, concentration_limits[limit_type])
+            for limit_type, dimension, label in CONCENTRATION_LIMIT_DIMENSIONS
+        )
+        self._min_liquidity_ratio = self.active_limits['liquidity_limits']['min_liquidity_ratio']
         
     async def check_all_limits(self):
         """Check all active portfolios against limits"""
         try:
-            portfolio_ids = await self._get_active_portfolios()
-            
-            for portfolio_id in portfolio_ids:
-                violations = await self.check_portfolio_limits(portfolio_id)
-                
-                if violations:
-                    await self._handle_limit_violations(portfolio_id, violations)
+            # Every violation found in this sweep is stamped with the sweep time
+            sweep_timestamp = datetime.utcnow()
+            
+            # Pages of portfolio ids stream through a bounded queue to a fixed worker
+            # pool, so memory stays proportional to the workers, not the portfolio count
+            n_workers = self.settings.limit_check_concurrency
+            queue: asyncio.Queue = asyncio.Queue(maxsize=2 * n_workers)
+            
+            async def worker():
+                while True:
+                    portfolio_ids = await queue.get()
+                    try:
+                        await self._check_portfolio_page(portfolio_ids, sweep_timestamp)
+                    except Exception as e:
+                        logger.error("Limit check page failed", check=_current_check.get(), error=str(e))
+                    finally:
+                        queue.task_done()
+            
+            workers = [asyncio.create_task(worker()) for _ in range(n_workers)]
+            try:
+                async for portfolio_ids in self._get_active_portfolios(self.settings.limit_check_page_size):
+                    await queue.put(portfolio_ids)
+                await queue.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
                     
         except Exception as e:
-            logger.error("Limit checking failed", error=str(e))
+            logger.error("Limit checking failed", check=_current_check.get(), error=str(e))
     
-    async def check_portfolio_limits(self, portfolio_id: str) -> List[Dict[str, Any]]:
-        """Check all limits for a specific portfolio"""
+    async def _check_portfolio_page(self, portfolio_ids: List[str], sweep_timestamp: datetime):
+        """Check and handle limits for one page of portfolios"""
+        # One round-trip for the page's data; the checks below do no I/O. Portfolios
+        # with fresh maintained position state skip the position fetch
+        stale_ids = [pid for pid in portfolio_ids if self._fresh_position_state(pid) is None]
+        portfolio_data = await self._get_portfolio_data_batch(portfolio_ids, stale_ids)
+        fetched = [(pid, portfolio_data[pid]) for pid in portfolio_ids if portfolio_data.get(pid)]
+        
+        # VaR and exposure limits for the whole page in one kernel call
+        scalar_violations = self._check_scalar_limits([data for _, data in fetched])
+        
+        for (portfolio_id, data), violations in zip(fetched, scalar_violations):
+            try:
+                violations.extend(self._check_position_limits(portfolio_id, data))
+            except Exception as e:
+                logger.error("Portfolio limit check failed", portfolio_id=portfolio_id,
+                             check=_current_check.get(), error=str(e))
+            
+            if violations:
+                await self._handle_limit_violations(portfolio_id, violations, sweep_timestamp)
+    
+    async def check_portfolio_limits(self, portfolio_id: str,
+                                     portfolio_data: Optional[Dict[str, Any]] = None) -> List[LimitViolation]:
+        """Check all limits for a specific portfolio, fetching its data unless provided"""
         try:
             violations = []
             
             # Get portfolio data
-            portfolio_data = await self._get_portfolio_data(portfolio_id)
+            if portfolio_data is None:
+                portfolio_data = await self._get_portfolio_data(portfolio_id)
             if not portfolio_data:
                 return violations
             
-            # Check VaR limits
-            var_violations = await self._check_var_limits(portfolio_id, portfolio_data)
-            violations.extend(var_violations)
+            # Check VaR and exposure limits
+            violations.extend(self._check_scalar_limits([portfolio_data])[0])
             
-            # Check concentration limits
-            concentration_violations = await self._check_concentration_limits(portfolio_id, portfolio_data)
-            violations.extend(concentration_violations)
-            
-            # Check exposure limits
-            exposure_violations = await self._check_exposure_limits(portfolio_id, portfolio_data)
-            violations.extend(exposure_violations)
-            
-            # Check liquidity limits
-            liquidity_violations = await self._check_liquidity_limits(portfolio_id, portfolio_data)
-            violations.extend(liquidity_violations)
+            # Check concentration and liquidity limits
+            violations.extend(self._check_position_limits(portfolio_id, portfolio_data))
             
             return violations
             
         except Exception as e:
-            logger.error(f"Portfolio limit check failed for {portfolio_id}", error=str(e))
+            logger.error("Portfolio limit check failed", portfolio_id=portfolio_id,
+                         check=_current_check.get(), error=str(e))
             return []
     
-    async def _check_var_limits(self, portfolio_id: str, portfolio_data: Dict) -> List[Dict[str, Any]]:
-        """Check VaR limits"""
-        violations = []
+    def _check_position_limits(self, portfolio_id: str, portfolio_data: Dict) -> List[LimitViolation]:
+        """Check limits computed from a portfolio's positions"""
+        _current_check.set('position_aggregation')
+        positions_soa = portfolio_data.get('positions_soa')
+        if positions_soa is None and 'positions' in portfolio_data:
+            positions_soa = self._positions_soa(portfolio_data['positions'])
+        
+        # Fetched positions reseed the maintained state; without them the state
+        # kept current by position updates is checked as it stands
+        if positions_soa is not None:
+            aggregates = self._seed_position_state(portfolio_id, positions_soa).aggregates
+        else:
+            state = self._position_states.get(portfolio_id)
+            if state is None:
+                return []
+            aggregates = state.aggregates
+        
+        violations = self._check_concentration_limits(portfolio_id, aggregates)
+        violations.extend(self._check_liquidity_limits(portfolio_id, aggregates))
+        return violations
+    
+    @staticmethod
+    def _make_violation(violation_type: str, severity: str, limit_type: str, current_value: float,
+                        limit_value: float, utilization: float, description_fmt: str,
+                        *description_args) -> LimitViolation:
+        """Build a violation; the description is formatted on first render"""
+        return LimitViolation(
+            violation_type, severity, limit_type, current_value, limit_value, utilization,
+            _LazyDescription(description_fmt, description_args)
+        )
+    
+    @staticmethod
+    def _compute_utilizations(current, limits):
+        """Limit utilization in percent, elementwise for arrays of current values and limits"""
+        return np.divide(current, limits) * 100.0
+    
+    def _scalar_limit_inputs(self, portfolio_data: Dict[str, Any]) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+        """Scalar limit kernel inputs and the portfolio type's limit row"""
+        total_value = portfolio_data.get('total_value', 0)
+        inputs = (
+            portfolio_data.get('var_95_1d', 0),
+            portfolio_data.get('var_99_1d', 0),
+            total_value,
+            portfolio_data.get('notional_exposure', total_value),
+            portfolio_data.get('modified_duration', 0)
+        )
+        limit_row = self._scalar_limit_rows.get(
+            portfolio_data.get('type', 'institutional'), self._default_scalar_limit_row
+        )
+        return inputs, limit_row
+    
+    def _check_scalar_limits(self, portfolios: List[Dict]) -> List[List[LimitViolation]]:
+        """Check VaR and exposure limits for a batch of portfolios"""
+        violations = [[] for _ in portfolios]
+        if not portfolios:
+            return violations
+        
+        _current_check.set('scalar_limits')
+        inputs = np.empty((len(portfolios), len(SCALAR_LIMITS)), dtype=np.float64)
+        limit_rows = []
+        
+        for row, portfolio_data in enumerate(portfolios):
+            inputs[row], limit_row = self._scalar_limit_inputs(portfolio_data)
+            limit_rows.append(limit_row)
+        
+        current, flags = scalar_limit_flags(inputs, np.array(limit_rows, dtype=np.float64))
+        
+        # Violation records are only built for flagged portfolio/limit pairs
+        flagged_rows, flagged_cols = np.nonzero(flags)
+        utilizations = self._compute_utilizations(
+            current[flagged_rows, flagged_cols],
+            np.array([limit_rows[row][col] for row, col in zip(flagged_rows, flagged_cols)], dtype=np.float64)
+        )
+        
+        for row, col, utilization in zip(flagged_rows, flagged_cols, utilizations):
+            limit_type, violation_type, severity, description = SCALAR_LIMITS[col]
+            current_value = float(current[row, col])
+            limit_value = limit_rows[row][col]
+            violations[row].append(self._make_violation(
+                violation_type, severity, limit_type, current_value, limit_value, float(utilization),
+                description, current_value, limit_value
+            ))
         
-        try:
-            portfolio_type = portfolio_data.get('type', 'institutional')
-            var_limits = self.active_limits['var_limits'].get(portfolio_type, {})
-            
-            current_var_95 = portfolio_data.get('var_95_1d', 0)
-            current_var_99 = portfolio_data.get('var_99_1d', 0)
-            
-            # Check 95% VaR limit
-            var_95_limit = var_limits.get('var_95_1d', float('inf'))
-            if current_var_95 > var_95_limit:
-                violations.append({
-                    'type': 'var_limit_breach',
-                    'severity': 'high',
-                    'limit_type': 'var_95_1d',
-                    'current_value': current_var_95,
-                    'limit_value': var_95_limit,
-                    'utilization': (current_var_95 / var_95_limit) * 100,
-                    'description': f'VaR 95% ({current_var_95:,.0f}) exceeds limit ({var_95_limit:,.0f})'
-                })
-            
-            # Check 99% VaR limit  
-            var_99_limit = var_limits.get('var_99_1d', float('inf'))
-            if current_var_99 > var_99_limit:
-                violations.append({
-                    'type': 'var_limit_breach',
-                    'severity': 'critical',
-                    'limit_type': 'var_99_1d',
-                    'current_value': current_var_99,
-                    'limit_value': var_99_limit,
-                    'utilization': (current_var_99 / var_99_limit) * 100,
-                    'description': f'VaR 99% ({current_var_99:,.0f}) exceeds limit ({var_99_limit:,.0f})'
-                })
-            
-        except Exception as e:
-            logger.error("VaR limit check failed", error=str(e))
-            
         return violations
     
-    async def _check_concentration_limits(self, portfolio_id: str, portfolio_data: Dict) -> List[Dict[str, Any]]:
+    def _check_concentration_limits(self, portfolio_id: str, aggregates: PositionAggregates) -> List[LimitViolation]:
         """Check concentration limits"""
         violations = []
         
-        try:
-            positions = portfolio_data.get('positions', [])
-            total_value = sum(pos['market_value'] for pos in positions)
-            
-            if total_value == 0:
-                return violations
-            
-            concentration_limits = self.active_limits['concentration_limits']
-            
-            # Check issuer concentration
-            issuer_exposure = {}
-            for pos in positions:
-                issuer = pos.get('issuer', 'Unknown')
-                issuer_exposure[issuer] = issuer_exposure.get(issuer, 0) + pos['market_value']
-            
-            max_issuer_exposure = max(issuer_exposure.values()) if issuer_exposure else 0
-            max_issuer_pct = max_issuer_exposure / total_value
-            
-            if max_issuer_pct > concentration_limits['single_issuer']:
-                violations.append({
-                    'type': 'concentration_limit_breach',
-                    'severity': 'medium',
-                    'limit_type': 'single_issuer',
-                    'current_value': max_issuer_pct,
-                    'limit_value': concentration_limits['single_issuer'],
-                    'utilization': (max_issuer_pct / concentration_limits['single_issuer']) * 100,
-                    'description': f'Single issuer concentration ({max_issuer_pct:.1%}) exceeds limit ({concentration_limits["single_issuer"]:.1%})'
-                })
-            
-            # Check sector concentration
-            sector_exposure = {}
-            for pos in positions:
-                sector = pos.get('sector', 'Unknown')
-                sector_exposure[sector] = sector_exposure.get(sector, 0) + pos['market_value']
-            
-            max_sector_exposure = max(sector_exposure.values()) if sector_exposure else 0
-            max_sector_pct = max_sector_exposure / total_value
-            
-            if max_sector_pct > concentration_limits['single_sector']:
-                violations.append({
-                    'type': 'concentration_limit_breach',
-                    'severity': 'medium',
-                    'limit_type': 'single_sector',
-                    'current_value': max_sector_pct,
-                    'limit_value': concentration_limits['single_sector'],
-                    'utilization': (max_sector_pct / concentration_limits['single_sector']) * 100,
-                    'description': f'Single sector concentration ({max_sector_pct:.1%}) exceeds limit ({concentration_limits["single_sector"]:.1%})'
-                })
-            
-        except Exception as e:
-            logger.error("Concentration limit check failed", error=str(e))
-            
+        _current_check.set('concentration_limits')
+        if aggregates.total == 0:
+            return violations
+        
+        for limit_type, dimension, label, limit_value in self._concentration_checks:
+            group_values = getattr(aggregates, f'by_{dimension}')
+            max_pct = float(group_values.max() / aggregates.total) if group_values.size else 0.0
+            
+            if max_pct > limit_value:
+                violation = self._make_violation(
+                    'concentration_limit_breach', 'medium', limit_type, max_pct, limit_value,
+                    float(self._compute_utilizations(max_pct, limit_value)),
+                    '{} concentration ({:.1%}) exceeds limit ({:.1%})', label, max_pct, limit_value
+                )
+                if dimension in TOP_EXPOSURE_DIMENSIONS:
+                    violation.top_exposures = self._top_exposures(
+                        dimension, group_values, aggregates.names[dimension], aggregates.total
+                    )
+                violations.append(violation)
+        
         return violations
     
-    async def _check_exposure_limits(self, portfolio_id: str, portfolio_data: Dict) -> List[Dict[str, Any]]:
-        """Check exposure limits"""
-        violations = []
+    @staticmethod
+    def _top_exposures(dimension: str, group_values: np.ndarray, names: np.ndarray,
+                       total_value: float) -> List[Dict[str, Any]]:
+        """Largest exposures for a dimension, found by partial selection rather than a full sort"""
+        k = min(TOP_EXPOSURE_COUNT, group_values.size)
+        top = np.argpartition(group_values, -k)[-k:]
+        top = top[np.argsort(group_values[top])[::-1]]
         
-        try:
-            total_value = portfolio_data.get('total_value', 0)
-            notional_exposure = portfolio_data.get('notional_exposure', total_value)
-            duration = portfolio_data.get('modified_duration', 0)
-            
-            exposure_limits = self.active_limits['exposure_limits']
-            
-            # Check total portfolio limit
-            if total_value > exposure_limits['total_portfolio']:
-                violations.append({
-                    'type': 'exposure_limit_breach',
-                    'severity': 'high',
-                    'limit_type': 'total_portfolio',
-                    'current_value': total_value,
-                    'limit_value': exposure_limits['total_portfolio'],
-                    'utilization': (total_value / exposure_limits['total_portfolio']) * 100,
-                    'description': f'Total portfolio value ({total_value:,.0f}) exceeds limit ({exposure_limits["total_portfolio"]:,.0f})'
-                })
-            
-            # Check leverage ratio
-            leverage_ratio = notional_exposure / total_value if total_value > 0 else 0
-            if leverage_ratio > exposure_limits['leverage_ratio']:
-                violations.append({
-                    'type': 'exposure_limit_breach',
-                    'severity': 'high',
-                    'limit_type': 'leverage_ratio',
-                    'current_value': leverage_ratio,
-                    'limit_value': exposure_limits['leverage_ratio'],
-                    'utilization': (leverage_ratio / exposure_limits['leverage_ratio']) * 100,
-                    'description': f'Leverage ratio ({leverage_ratio:.2f}) exceeds limit ({exposure_limits["leverage_ratio"]:.2f})'
-                })
-            
-            # Check duration limit
-            if duration > exposure_limits['duration_limit']:
-                violations.append({
-                    'type': 'exposure_limit_breach',
-                    'severity': 'medium',
-                    'limit_type': 'duration_limit',
-                    'current_value': duration,
-                    'limit_value': exposure_limits['duration_limit'],
-                    'utilization': (duration / exposure_limits['duration_limit']) * 100,
-                    'description': f'Portfolio duration ({duration:.2f}) exceeds limit ({exposure_limits["duration_limit"]:.2f})'
-                })
-                
-        except Exception as e:
-            logger.error("Exposure limit check failed", error=str(e))
-            
+        return [
+            {
+                dimension: names[code],
+                'market_value': float(group_values[code]),
+                'percentage': float(group_values[code] / total_value)
+            }
+            for code in top
+            if group_values[code] > 0
+        ]
+    
+    @staticmethod
+    def _positions_soa(positions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Columnar market values, liquidity scores and per-portfolio integer dimension codes for positions"""
+        n = len(positions)
+        soa = {
+            'symbol': [pos.get('symbol') for pos in positions],
+            'market_value': np.fromiter((pos['market_value'] for pos in positions), dtype=np.float64, count=n),
+            'liquidity_score': np.fromiter(
+                (pos.get('liquidity_score', 0.5) for pos in positions), dtype=np.float64, count=n
+            )
+        }
+        
+        # Codes index this portfolio's own uniques, so group arrays are sized by its distinct values
+        soa['names'] = {}
+        for dimension, default in POSITION_DIMENSION_DEFAULTS.items():
+            codes, uniques = pd.factorize(
+                np.array([pos.get(dimension) or default for pos in positions], dtype=object)
+            )
+            soa[dimension] = codes.astype(np.int32)
+            soa['names'][dimension] = uniques
+        
+        # Maturity bucket codes; positions without a parseable maturity date are left out (-1)
+        maturity_dates = pd.to_datetime(
+            [pos.get('maturity_date') for pos in positions], utc=True, errors='coerce', format='ISO8601'
+        )
+        years_to_maturity = np.asarray((maturity_dates - pd.Timestamp.now(tz='UTC')).days / 365.25, dtype=np.float64)
+        buckets = np.searchsorted(MATURITY_BUCKET_EDGES, years_to_maturity).astype(np.int32)
+        buckets[np.isnan(years_to_maturity)] = -1
+        soa['maturity_bucket'] = buckets
+        
+        return soa
+    
+    @staticmethod
+    def _aggregate_positions(positions_soa: Dict[str, Any]) -> PositionAggregates:
+        """Aggregate market values for every position-based limit from the columnar view"""
+        market_values = positions_soa['market_value']
+        names = positions_soa['names']
+        by_dimension = {
+            dimension: np.bincount(
+                positions_soa[dimension], weights=market_values, minlength=len(names[dimension])
+            ).astype(np.float64, copy=False)
+            for dimension in POSITION_DIMENSION_DEFAULTS
+        }
+        
+        buckets = positions_soa['maturity_bucket']
+        dated = buckets >= 0
+        
+        return PositionAggregates(
+            total=float(market_values.sum()),
+            liquid=float(market_values[positions_soa['liquidity_score'] >= 0.7].sum()),
+            by_issuer=by_dimension['issuer'],
+            by_sector=by_dimension['sector'],
+            by_rating=by_dimension['rating'],
+            # bincount yields integers when nothing is dated; updates add floats in place
+            by_maturity_bucket=np.bincount(
+                buckets[dated], weights=market_values[dated], minlength=len(MATURITY_BUCKET_EDGES) + 1
+            ).astype(np.float64, copy=False),
+            names=names
+        )
+    
+    def _fresh_position_state(self, portfolio_id: str) -> Optional[PortfolioPositionState]:
+        """Maintained state for a portfolio if seeded within settings.position_state_ttl seconds"""
+        state = self._position_states.get(portfolio_id)
+        if state is None or time.monotonic() - state.seeded_at > self.settings.position_state_ttl:
+            return None
+        self._position_states.move_to_end(portfolio_id)
+        return state
+    
+    def _seed_position_state(self, portfolio_id: str, positions_soa: Dict[str, Any]) -> PortfolioPositionState:
+        """Rebuild a portfolio's maintained state from its full positions, evicting the least recently used"""
+        aggregates = self._aggregate_positions(positions_soa)
+        aggregates.names = dict(aggregates.names)
+        
+        dimension_codes = zip(*(positions_soa[dimension].tolist() for dimension in POSITION_DIMENSION_DEFAULTS))
+        liquid = (positions_soa['liquidity_score'] >= 0.7).tolist()
+        state = PortfolioPositionState(
+            aggregates=aggregates,
+            codes={
+                dimension: {name: code for code, name in enumerate(names)}
+                for dimension, names in aggregates.names.items()
+            },
+            positions={
+                symbol: (market_value, codes, bucket, is_liquid)
+                for symbol, market_value, codes, bucket, is_liquid in zip(
+                    positions_soa['symbol'], positions_soa['market_value'].tolist(), dimension_codes,
+                    positions_soa['maturity_bucket'].tolist(), liquid
+                )
+            },
+            seeded_at=time.monotonic()
+        )
+        
+        self._position_states[portfolio_id] = state
+        self._position_states.move_to_end(portfolio_id)
+        while len(self._position_states) > self.settings.position_state_max:
+            self._position_states.popitem(last=False)
+        
+        return state
+    
+    async def apply_position_update(self, portfolio_id: str,
+                                    position: Dict[str, Any]) -> Optional[List[LimitViolation]]:
+        """Fold one position's current state into the portfolio's maintained aggregates and
+        recheck its position limits; returns None when the portfolio has no fresh state"""
+        state = self._fresh_position_state(portfolio_id)
+        if state is None:
+            # The next sweep reseeds the portfolio from its full positions
+            return None
+        
+        self._apply_position_delta(state, position)
+        
+        violations = self._check_concentration_limits(portfolio_id, state.aggregates)
+        violations.extend(self._check_liquidity_limits(portfolio_id, state.aggregates))
+        if violations:
+            await self._handle_limit_violations(portfolio_id, violations)
         return violations
     
-    async def _check_liquidity_limits(self, portfolio_id: str, portfolio_data: Dict) -> List[Dict[str, Any]]:
+    def _apply_position_delta(self, state: PortfolioPositionState, position: Dict[str, Any]):
+        """Replace a position's contribution to the aggregates; a zero market value closes it"""
+        symbol = position['symbol']
+        previous = state.positions.pop(symbol, None)
+        if previous is not None:
+            self._fold_position(state.aggregates, previous, -1.0)
+        
+        position_soa = self._positions_soa([position])
+        market_value = float(position_soa['market_value'][0])
+        if market_value == 0:
+            return
+        
+        codes = tuple(
+            self._position_code(state, dimension, position_soa['names'][dimension][0])
+            for dimension in POSITION_DIMENSION_DEFAULTS
+        )
+        entry = (
+            market_value, codes, int(position_soa['maturity_bucket'][0]),
+            bool(position_soa['liquidity_score'][0] >= 0.7)
+        )
+        state.positions[symbol] = entry
+        self._fold_position(state.aggregates, entry, 1.0)
+    
+    @staticmethod
+    def _position_code(state: PortfolioPositionState, dimension: str, name: str) -> int:
+        """Portfolio code for a dimension value, extending the group arrays for new values"""
+        codes = state.codes[dimension]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(codes)
+            aggregates = state.aggregates
+            aggregates.names[dimension] = np.append(aggregates.names[dimension], np.array([name], dtype=object))
+            field = f'by_{dimension}'
+            setattr(aggregates, field, np.append(getattr(aggregates, field), 0.0))
+        return code
+    
+    @staticmethod
+    def _fold_position(aggregates: PositionAggregates, entry: PositionEntry, sign: float):
+        """Add (sign 1) or remove (sign -1) one position's contribution to the aggregates"""
+        market_value, codes, bucket, liquid = entry
+        value = sign * market_value
+        
+        aggregates.total += value
+        if liquid:
+            aggregates.liquid += value
+        for dimension, code in zip(POSITION_DIMENSION_DEFAULTS, codes):
+            getattr(aggregates, f'by_{dimension}')[code] += value
+        if bucket >= 0:
+            aggregates.by_maturity_bucket[bucket] += value
+    
+    def _check_liquidity_limits(self, portfolio_id: str, aggregates: PositionAggregates) -> List[LimitViolation]:
         """Check liquidity limits"""
         violations = []
         
-        try:
-            positions = portfolio_data.get('positions', [])
-            total_value = sum(pos['market_value'] for pos in positions)
-            
-            if total_value == 0:
-                return violations
-            
-            liquidity_limits = self.active_limits['liquidity_limits']
-            
-            # Calculate liquidity metrics
-            liquid_value = sum(pos['market_value'] for pos in positions 
-                             if pos.get('liquidity_score', 0.5) >= 0.7)
-            liquidity_ratio = liquid_value / total_value
-            
-            # Check minimum liquidity ratio
-            if liquidity_ratio < liquidity_limits['min_liquidity_ratio']:
-                violations.append({
-                    'type': 'liquidity_limit_breach',
-                    'severity': 'high',
-                    'limit_type': 'min_liquidity_ratio',
-                    'current_value': liquidity_ratio,
-                    'limit_value': liquidity_limits['min_liquidity_ratio'],
-                    'utilization': (liquidity_ratio / liquidity_limits['min_liquidity_ratio']) * 100,
-                    'description': f'Liquidity ratio ({liquidity_ratio:.1%}) below minimum ({liquidity_limits["min_liquidity_ratio"]:.1%})'
-                })
-                
-        except Exception as e:
-            logger.error("Liquidity limit check failed", error=str(e))
-            
+        _current_check.set('liquidity_limits')
+        if aggregates.total == 0:
+            return violations
+        
+        # Calculate liquidity metrics
+        liquidity_ratio = aggregates.liquid / aggregates.total
+        
+        # Check minimum liquidity ratio
+        min_liquidity_ratio = self._min_liquidity_ratio
+        if liquidity_ratio < min_liquidity_ratio:
+            violations.append(self._make_violation(
+                'liquidity_limit_breach', 'high', 'min_liquidity_ratio',
+                liquidity_ratio, min_liquidity_ratio,
+                float(self._compute_utilizations(liquidity_ratio, min_liquidity_ratio)),
+                'Liquidity ratio ({:.1%}) below minimum ({:.1%})',
+                liquidity_ratio, min_liquidity_ratio
+            ))
+        
         return violations
     
-    async def _handle_limit_violations(self, portfolio_id: str, violations: List[Dict[str, Any]]):
-        """Handle limit violations"""
+    async def _handle_limit_violations(self, portfolio_id: str, violations: List[LimitViolation],
+                                       timestamp: Optional[datetime] = None):
+        """Handle limit violations detected at timestamp (defaults to now)"""
         try:
+            if timestamp is None:
+                timestamp = datetime.utcnow()
+            
             for violation in violations:
                 # Log violation
                 logger.warning(
                     "Risk limit violation detected",
                     portfolio_id=portfolio_id,
-                    violation_type=violation['type'],
-                    severity=violation['severity'],
-                    description=violation['description']
+                    violation_type=violation.type,
+                    severity=violation.severity,
+                    description=violation.description
                 )
                 
                 # Store violation history
-                violation_record = {
-                    'portfolio_id': portfolio_id,
-                    'timestamp': datetime.utcnow(),
-                    **violation
-                }
-                self.violation_history.append(violation_record)
+                self.violation_history.append(LimitViolationRecord(portfolio_id, timestamp, violation))
                 
                 # Send alerts based on severity
-                if violation['severity'] in ['high', 'critical']:
+                if violation.severity in ['high', 'critical']:
                     await self._send_violation_alert(portfolio_id, violation)
                     
         except Exception as e:
             logger.error("Failed to handle limit violations", error=str(e))
     
-    async def _send_violation_alert(self, portfolio_id: str, violation: Dict[str, Any]):
+    async def _send_violation_alert(self, portfolio_id: str, violation: LimitViolation):
         """Send violation alert to risk managers"""
         # This would integrate with notification service
         logger.critical(
             "CRITICAL RISK LIMIT VIOLATION",
             portfolio_id=portfolio_id,
-            violation=violation
+            violation=violation.to_dict()
         )
     
-    async def _get_active_portfolios(self) -> List[str]:
-        """Get list of active portfolio IDs"""
-        # Placeholder - would fetch from database
-        return ['portfolio-1', 'portfolio-2', 'portfolio-3']
+    async def _get_active_portfolios(self, page_size: int = 1000) -> AsyncIterator[List[str]]:
+        """Stream active portfolio IDs in pages of up to page_size"""
+        # Placeholder - would page through the portfolio store with a server-side cursor
+        portfolio_ids = ['portfolio-1', 'portfolio-2', 'portfolio-3']
+        for start in range(0, len(portfolio_ids), page_size):
+            yield portfolio_ids[start:start + page_size]
     
     async def _get_portfolio_data(self, portfolio_id: str) -> Dict[str, Any]:
         """Get portfolio data for limit checking"""
-        # Placeholder - would fetch comprehensive portfolio data
+        portfolios = await self._get_portfolio_data_batch([portfolio_id])
+        return portfolios.get(portfolio_id, {})
+    
+    async def _get_portfolio_data_batch(self, portfolio_ids: List[str],
+                                        position_ids: Optional[Collection[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get limit checking data for many portfolios in one round-trip, with positions
+        only for position_ids (all portfolios when None)"""
+        # Placeholder - would fetch all portfolios with a single
+        # `WHERE portfolio_id = ANY($1)` query, joining positions for position_ids only
+        portfolios = {portfolio_id: self._placeholder_portfolio_data(portfolio_id) for portfolio_id in portfolio_ids}
+        if position_ids is not None:
+            position_ids = set(position_ids)
+            for portfolio_id, portfolio_data in portfolios.items():
+                if portfolio_id not in position_ids:
+                    del portfolio_data['positions']
+        
+        # Encode positions once here so repeated limit checks skip string hashing
+        for portfolio_data in portfolios.values():
+            if 'positions' in portfolio_data:
+                portfolio_data['positions_soa'] = self._positions_soa(portfolio_data['positions'])
+        
+        return portfolios
+    
+    @staticmethod
+    def _placeholder_portfolio_data(portfolio_id: str) -> Dict[str, Any]:
+        """Sample portfolio used until the portfolio store is wired in"""
         return {
             'portfolio_id': portfolio_id,
             'type': 'institutional',
@@ -361,8 +685,6 @@ class LimitMonitoringEngine:
             if not portfolio_data:
                 return {}
             
-            portfolio_type = portfolio_data.get('type', 'institutional')
-            
             limits_status = {
                 'var_limits': {},
                 'concentration_limits': {},
@@ -370,18 +692,27 @@ class LimitMonitoringEngine:
                 'liquidity_limits': {}
             }
             
-            # VaR limits status
-            var_limits = self.active_limits['var_limits'].get(portfolio_type, {})
-            current_var_95 = portfolio_data.get('var_95_1d', 0)
-            current_var_99 = portfolio_data.get('var_99_1d', 0)
-            
-            if 'var_95_1d' in var_limits:
-                limits_status['var_limits']['var_95_1d'] = {
-                    'current': current_var_95,
-                    'limit': var_limits['var_95_1d'],
-                    'utilization': (current_var_95 / var_limits['var_95_1d']) * 100,
-                    'status': 'green' if current_var_95 <= var_limits['var_95_1d'] * 0.8 else 
-                             'yellow' if current_var_95 <= var_limits['var_95_1d'] else 'red'
+            # Same inputs and leverage calculation as the limit checks
+            inputs, limit_row = self._scalar_limit_inputs(portfolio_data)
+            current, _ = scalar_limit_flags(
+                np.array([inputs], dtype=np.float64), np.array([limit_row], dtype=np.float64)
+            )
+            current = current[0]
+            limits = np.array(limit_row, dtype=np.float64)
+            
+            # Utilization and status bands for every limit in one pass
+            utilizations = self._compute_utilizations(current, limits)
+            statuses = LIMIT_STATUS_LABELS[np.digitize(utilizations, LIMIT_STATUS_THRESHOLDS, right=True)]
+            
+            # VaR limits are only reported for configured portfolio types
+            for col, (limit_type, _, _, _) in enumerate(SCALAR_LIMITS):
+                if limit_row[col] == float('inf'):
+                    continue
+                limits_status[SCALAR_LIMIT_GROUPS[col]][limit_type] = {
+                    'current': float(current[col]),
+                    'limit': limit_row[col],
+                    'utilization': float(utilizations[col]),
+                    'status': str(statuses[col])
                 }
             
             return limits_status
@@ -1,12 +1,142 @@
 import numpy as np
-import pandas as pd
+from types import MappingProxyType
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import asyncio
 import structlog
 
+from ._risk_kernels import credit_spread_impacts, inflation_impacts, partition_percentiles
+
 logger = structlog.get_logger()
 
+# Instrument types exposed to credit spread and default scenarios
+CREDIT_INSTRUMENT_TYPES = ('corporate_bond', 'cd', 'cp')
+
+# Annual default probability by rating
+RATING_DEFAULT_PROBABILITIES = {
+    'AAA': 0.0001, 'AA+': 0.0002, 'AA': 0.0003, 'AA-': 0.0005,
+    'A+': 0.0008, 'A': 0.0012, 'A-': 0.0018,
+    'BBB+': 0.0025, 'BBB': 0.0035, 'BBB-': 0.0050,
+    'BB+': 0.0075, 'BB': 0.0125, 'BB-': 0.0200,
+    'B+': 0.0350, 'B': 0.0600, 'B-': 0.1000,
+    'CCC': 0.2000, 'CC': 0.3000, 'C': 0.5000
+}
+
+# Integer rating codes index the probability table; unknown ratings take the last slot (5%)
+RATING_CODES = {rating: code for code, rating in enumerate(RATING_DEFAULT_PROBABILITIES)}
+UNKNOWN_RATING_CODE = len(RATING_CODES)
+DEFAULT_PROBABILITY_TABLE = np.array([*RATING_DEFAULT_PROBABILITIES.values(), 0.05], dtype=np.float64)
+
+# Predefined stress test scenarios
+SCENARIO_DEFINITIONS = {
+    'interest_rate_shock': {
+        'name': 'Interest Rate Shock',
+        'description': 'Parallel shift in yield curve',
+        'parameters': {
+            'yield_shift_up': [0.5, 1.0, 2.0, 3.0],  # basis points * 100
+            'yield_shift_down': [-0.5, -1.0, -2.0, -3.0]
+        }
+    },
+    'credit_spread_widening': {
+        'name': 'Credit Spread Widening', 
+        'description': 'Credit spreads widen across ratings',
+        'parameters': {
+            'spread_multiplier': [1.5, 2.0, 3.0, 5.0]
+        }
+    },
+    'liquidity_crisis': {
+        'name': 'Liquidity Crisis',
+        'description': 'Severe liquidity constraints',
+        'parameters': {
+            'liquidity_discount': [0.05, 0.10, 0.20, 0.30]
+        }
+    },
+    'inflation_shock': {
+        'name': 'Inflation Shock',
+        'description': 'Unexpected inflation increase',
+        'parameters': {
+            'inflation_increase': [2.0, 3.0, 5.0, 7.0]  # percentage points
+        }
+    },
+    'default_cluster': {
+        'name': 'Default Cluster',
+        'description': 'Multiple defaults in sector',
+        'parameters': {
+            'default_rate_multiplier': [2.0, 5.0, 10.0, 20.0]
+        }
+    }
+}
+
+def _precompute_parameters(scenario_name: str, parameters: Dict) -> Dict[str, Any]:
+    """Parameter entries and float32 parameter vectors the shock kernels broadcast against"""
+    if scenario_name == 'interest_rate_shock':
+        shift_params = [(shift_type, shift) for shift_type, shifts in parameters.items() for shift in shifts]
+        shifts = np.array([shift for _, shift in shift_params], dtype=np.float32)
+        return {
+            'entries': [
+                {'scenario_parameter': f"{shift_type}_{shift}%", 'yield_shift': shift}
+                for shift_type, shift in shift_params
+            ],
+            'yield_changes': shifts / 100
+        }
+    elif scenario_name == 'credit_spread_widening':
+        multipliers = parameters['spread_multiplier']
+        return {
+            'entries': [
+                {'scenario_parameter': f"spread_multiplier_{multiplier}x", 'spread_multiplier': multiplier}
+                for multiplier in multipliers
+            ],
+            'spread_increase_factors': np.asarray(multipliers, dtype=np.float32) - 1
+        }
+    elif scenario_name == 'liquidity_crisis':
+        discounts = parameters['liquidity_discount']
+        return {
+            'entries': [
+                {'scenario_parameter': f"liquidity_discount_{discount*100}%", 'liquidity_discount': discount}
+                for discount in discounts
+            ],
+            'liquidity_discounts': np.asarray(discounts, dtype=np.float32)
+        }
+    elif scenario_name == 'inflation_shock':
+        increases = np.asarray(parameters['inflation_increase'], dtype=np.float32)
+        return {
+            'entries': [
+                {'scenario_parameter': f"inflation_increase_{inflation_increase}%", 'inflation_increase': inflation_increase}
+                for inflation_increase in parameters['inflation_increase']
+            ],
+            # Assume 70% of the inflation shock translates to a rate increase
+            'inflation_changes': increases / 100,
+            'rate_changes': (increases * 0.7) / 100
+        }
+    elif scenario_name == 'default_cluster':
+        multipliers = parameters['default_rate_multiplier']
+        return {
+            'entries': [
+                {'scenario_parameter': f"default_multiplier_{multiplier}x", 'default_multiplier': multiplier}
+                for multiplier in multipliers
+            ],
+            'default_rate_multipliers': np.asarray(multipliers, dtype=np.float32)
+        }
+    return {}
+
+def _frozen_parameters(scenario_name: str, parameters: Dict) -> MappingProxyType:
+    """Precomputed parameters with their vectors marked read-only"""
+    precomputed = _precompute_parameters(scenario_name, parameters)
+    for value in precomputed.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return MappingProxyType(precomputed)
+
+# Scenario definitions with their precomputed parameters, built once per process
+# and shared read-only by every engine
+SCENARIOS = MappingProxyType({
+    scenario_name: MappingProxyType({
+        **scenario,
+        '_precomputed': _frozen_parameters(scenario_name, scenario['parameters'])
+    })
+    for scenario_name, scenario in SCENARIO_DEFINITIONS.items()
+})
+
 class StressTestingEngine:
     """Advanced stress testing for portfolio risk assessment"""
     
@@ -21,66 +151,42 @@ class StressTestingEngine:
         
     async def _load_scenarios(self):
         """Load predefined stress test scenarios"""
-        self.scenarios = {
-            'interest_rate_shock': {
-                'name': 'Interest Rate Shock',
-                'description': 'Parallel shift in yield curve',
-                'parameters': {
-                    'yield_shift_up': [0.5, 1.0, 2.0, 3.0],  # basis points * 100
-                    'yield_shift_down': [-0.5, -1.0, -2.0, -3.0]
-                }
-            },
-            'credit_spread_widening': {
-                'name': 'Credit Spread Widening', 
-                'description': 'Credit spreads widen across ratings',
-                'parameters': {
-                    'spread_multiplier': [1.5, 2.0, 3.0, 5.0]
-                }
-            },
-            'liquidity_crisis': {
-                'name': 'Liquidity Crisis',
-                'description': 'Severe liquidity constraints',
-                'parameters': {
-                    'liquidity_discount': [0.05, 0.10, 0.20, 0.30]
-                }
-            },
-            'inflation_shock': {
-                'name': 'Inflation Shock',
-                'description': 'Unexpected inflation increase',
-                'parameters': {
-                    'inflation_increase': [2.0, 3.0, 5.0, 7.0]  # percentage points
-                }
-            },
-            'default_cluster': {
-                'name': 'Default Cluster',
-                'description': 'Multiple defaults in sector',
-                'parameters': {
-                    'default_rate_multiplier': [2.0, 5.0, 10.0, 20.0]
-                }
-            }
-        }
+        # Shared, read-only definitions with parameter vectors already precomputed
+        self.scenarios = SCENARIOS
         
     async def run_scenarios(self, portfolio_id: str, scenario_names: List[str], 
-                          confidence_level: float = 0.95) -> Dict[str, Any]:
-        """Run stress test scenarios on portfolio"""
+                          confidence_level: float = 0.95, include_positions: bool = True) -> Dict[str, Any]:
+        """Run stress test scenarios on portfolio; include_positions=False returns portfolio-level impacts only"""
         try:
             # Get portfolio data
             positions = await self._get_portfolio_positions(portfolio_id)
             if not positions:
                 return {"error": "No portfolio positions found"}
             
-            results = {}
-            baseline_value = sum(pos['market_value'] for pos in positions)
+            # All scenarios share one pass over the positions and one impact matrix
+            positions_soa = self._positions_to_arrays(positions)
+            baseline_value = positions_soa['market_value_total']
             
-            for scenario_name in scenario_names:
+            known_scenarios = []
+            for scenario_name in dict.fromkeys(scenario_names):
                 if scenario_name not in self.scenarios:
                     logger.warning(f"Unknown scenario: {scenario_name}")
                     continue
-                    
-                scenario_results = await self._run_single_scenario(
-                    positions, scenario_name, baseline_value
-                )
-                results[scenario_name] = scenario_results
+                known_scenarios.append(scenario_name)
+            
+            # Scenario arithmetic is CPU-bound NumPy work; run it off the event loop
+            results = await asyncio.to_thread(
+                self._run_all_shocks_vectorized, positions_soa, known_scenarios, baseline_value
+            )
+            
+            # Position impacts stay in record arrays until here, and are only
+            # converted to dicts when the caller wants them
+            for scenario_results in results.values():
+                for impact in scenario_results.get('impacts', []):
+                    if include_positions:
+                        impact['position_impacts'] = self._records_to_json(impact['position_impacts'])
+                    else:
+                        del impact['position_impacts']
             
             # Summary statistics
             results['summary'] = self._calculate_scenario_summary(results, baseline_value)
@@ -91,280 +197,277 @@ class StressTestingEngine:
             logger.error(f"Stress testing failed for {portfolio_id}", error=str(e))
             return {"error": str(e)}
     
-    async def _run_single_scenario(self, positions: List[Dict], scenario_name: str, 
-                                 baseline_value: float) -> Dict[str, Any]:
-        """Run a single stress test scenario"""
-        try:
-            scenario = self.scenarios[scenario_name]
-            results = {
-                'scenario_name': scenario_name,
-                'description': scenario['description'],
-                'impacts': []
-            }
-            
-            if scenario_name == 'interest_rate_shock':
-                results['impacts'] = await self._interest_rate_shock(positions, scenario['parameters'])
-            elif scenario_name == 'credit_spread_widening':
-                results['impacts'] = await self._credit_spread_shock(positions, scenario['parameters'])
-            elif scenario_name == 'liquidity_crisis':
-                results['impacts'] = await self._liquidity_shock(positions, scenario['parameters'])
-            elif scenario_name == 'inflation_shock':
-                results['impacts'] = await self._inflation_shock(positions, scenario['parameters'])
-            elif scenario_name == 'default_cluster':
-                results['impacts'] = await self._default_shock(positions, scenario['parameters'])
-            
-            # Calculate portfolio level impacts
-            for impact in results['impacts']:
-                impact['portfolio_impact_pct'] = (impact['portfolio_value_change'] / baseline_value) * 100
-                impact['portfolio_impact_absolute'] = impact['portfolio_value_change']
+    def _run_all_shocks_vectorized(self, positions_soa: Dict[str, Any], scenario_names: List[str],
+                                   baseline_value: float) -> Dict[str, Any]:
+        """Run scenarios as row blocks of a single (parameters x positions) impact matrix"""
+        shock_builders = {
+            'interest_rate_shock': self._interest_rate_shock,
+            'credit_spread_widening': self._credit_spread_shock,
+            'liquidity_crisis': self._liquidity_shock,
+            'inflation_shock': self._inflation_shock,
+            'default_cluster': self._default_shock
+        }
+        
+        blocks = {}
+        errors = {}
+        for scenario_name in scenario_names:
+            try:
+                blocks[scenario_name] = shock_builders[scenario_name](
+                    positions_soa, self.scenarios[scenario_name]['_precomputed']
+                )
+            except Exception as e:
+                logger.error(f"Single scenario {scenario_name} failed", error=str(e))
+                errors[scenario_name] = {"error": str(e)}
+        
+        # Totals and position percentages for every scenario parameter at once
+        n_positions = positions_soa['market_values'].shape[0]
+        impact_matrix = np.vstack(
+            [block for _, block, _, _ in blocks.values()] or [np.empty((0, n_positions), dtype=np.float32)]
+        )
+        pct_matrix = self._safe_pct(impact_matrix, positions_soa['market_values'])
+        total_impacts = impact_matrix.sum(axis=1, dtype=np.float64)
+        portfolio_pcts = self._safe_pct(total_impacts, np.float64(baseline_value)).tolist()
+        total_impacts = total_impacts.tolist()
+        
+        results = {}
+        row = 0
+        for scenario_name in scenario_names:
+            if scenario_name in errors:
+                results[scenario_name] = errors[scenario_name]
+                continue
             
-            return results
+            parameter_entries, _, details, affected = blocks[scenario_name]
+            position_idx = np.arange(n_positions) if affected is None else np.flatnonzero(affected)
+            symbols = [positions_soa['symbols'][i] for i in position_idx]
+            block_rows = slice(row, row + len(parameter_entries))
+            records = self._impact_records(
+                symbols, details, position_idx,
+                impact_matrix[block_rows][:, position_idx], pct_matrix[block_rows][:, position_idx]
+            )
             
-        except Exception as e:
-            logger.error(f"Single scenario {scenario_name} failed", error=str(e))
-            return {"error": str(e)}
-    
-    async def _interest_rate_shock(self, positions: List[Dict], parameters: Dict) -> List[Dict]:
-        """Simulate interest rate shock"""
-        impacts = []
-        
-        for shift_type, shifts in parameters.items():
-            for shift in shifts:
-                total_impact = 0
-                position_impacts = []
-                
-                for position in positions:
-                    # Calculate duration-based impact
-                    duration = position.get('modified_duration', 5.0)  # Default 5 years
-                    market_value = position['market_value']
-                    
-                    # Price impact = -Duration × Yield Change × Market Value
-                    price_impact = -duration * (shift / 100) * market_value
-                    total_impact += price_impact
-                    
-                    position_impacts.append({
-                        'symbol': position['symbol'],
-                        'market_value': market_value,
-                        'duration': duration,
-                        'price_impact': price_impact,
-                        'impact_pct': (price_impact / market_value) * 100 if market_value > 0 else 0
-                    })
-                
+            impacts = []
+            for block_row, entry in enumerate(parameter_entries):
+                total_impact = total_impacts[row]
                 impacts.append({
-                    'scenario_parameter': f"{shift_type}_{shift}%",
-                    'yield_shift': shift,
+                    **entry,
                     'portfolio_value_change': total_impact,
-                    'position_impacts': position_impacts
+                    'position_impacts': records[block_row],
+                    'portfolio_impact_pct': portfolio_pcts[row],
+                    'portfolio_impact_absolute': total_impact
                 })
+                row += 1
+            
+            results[scenario_name] = {
+                'scenario_name': scenario_name,
+                'description': self.scenarios[scenario_name]['description'],
+                'impacts': impacts
+            }
         
-        return impacts
+        return results
     
-    async def _credit_spread_shock(self, positions: List[Dict], parameters: Dict) -> List[Dict]:
-        """Simulate credit spread widening"""
-        impacts = []
+    def _positions_to_arrays(self, positions: List[Dict]) -> Dict[str, Any]:
+        """Columnar position fields and scenario masks with scenario defaults, filled in one pass"""
+        # Per-position values are float32 for the shock arithmetic; the market
+        # value total is summed in float64 before the downcast
+        n = len(positions)
+        symbols = [None] * n
+        instrument_types = [None] * n
+        ratings = [None] * n
+        market_values = np.empty(n, dtype=np.float64)
+        durations = np.empty(n, dtype=np.float32)
+        credit_spreads = np.empty(n, dtype=np.float32)
+        liquidity_scores = np.empty(n, dtype=np.float32)
+        rating_codes = np.empty(n, dtype=np.intp)
+        is_credit = np.empty(n, dtype=bool)
+        inflation_linked = np.empty(n, dtype=bool)
         
-        for multiplier in parameters['spread_multiplier']:
-            total_impact = 0
-            position_impacts = []
+        for i, position in enumerate(positions):
+            instrument_type = position.get('instrument_type')
+            rating = position.get('rating', 'BBB')
             
-            for position in positions:
-                # Only apply to credit-sensitive instruments
-                if position.get('instrument_type') in ['corporate_bond', 'cd', 'cp']:
-                    current_spread = position.get('credit_spread', 1.0)  # Default 1%
-                    spread_change = current_spread * (multiplier - 1)
-                    
-                    duration = position.get('modified_duration', 5.0)
-                    market_value = position['market_value']
-                    
-                    # Impact = -Duration × Spread Change × Market Value
-                    price_impact = -duration * (spread_change / 100) * market_value
-                    total_impact += price_impact
-                    
-                    position_impacts.append({
-                        'symbol': position['symbol'],
-                        'current_spread': current_spread,
-                        'spread_change': spread_change,
-                        'price_impact': price_impact,
-                        'impact_pct': (price_impact / market_value) * 100 if market_value > 0 else 0
-                    })
+            symbols[i] = position['symbol']
+            market_values[i] = position['market_value']
+            durations[i] = position.get('modified_duration', 5.0)
+            credit_spreads[i] = position.get('credit_spread', 1.0)
+            liquidity_scores[i] = position.get('liquidity_score', 0.5)
+            ratings[i] = rating
+            rating_codes[i] = RATING_CODES.get(rating, UNKNOWN_RATING_CODE)
+            is_credit[i] = instrument_type in CREDIT_INSTRUMENT_TYPES
             
-            impacts.append({
-                'scenario_parameter': f"spread_multiplier_{multiplier}x",
-                'spread_multiplier': multiplier,
-                'portfolio_value_change': total_impact,
-                'position_impacts': position_impacts
-            })
+            # Untyped positions are treated as corporate bonds by the inflation shock
+            if instrument_type is None:
+                instrument_type = 'corporate_bond'
+            instrument_types[i] = instrument_type
+            inflation_linked[i] = 'inflation_linked' in instrument_type.lower()
         
-        return impacts
+        return {
+            'symbols': symbols,
+            'instrument_types': instrument_types,
+            'ratings': ratings,
+            'market_value_total': float(market_values.sum()),
+            'market_values': market_values.astype(np.float32),
+            'durations': durations,
+            'credit_spreads': credit_spreads,
+            'liquidity_scores': liquidity_scores,
+            'rating_codes': rating_codes,
+            'is_credit': is_credit,
+            'inflation_linked': inflation_linked
+        }
     
-    async def _liquidity_shock(self, positions: List[Dict], parameters: Dict) -> List[Dict]:
-        """Simulate liquidity crisis"""
-        impacts = []
+    @staticmethod
+    def _safe_pct(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+        """num / den * 100 where den is positive and zero elsewhere, without per-element branches"""
+        num, den = np.broadcast_arrays(num, den)
+        out = np.zeros_like(num)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(num, den, out=out, where=den > 0)
+        out *= 100
+        return out
+    
+    @staticmethod
+    def _impact_records(symbols: List[str], details: Dict[str, Any], position_idx: np.ndarray,
+                        price_impacts: np.ndarray, impact_pcts: np.ndarray) -> np.ndarray:
+        """(parameters x affected positions) structured array of position impacts"""
+        # Detail columns are per-position lists, per-position arrays or per-parameter rows
+        columns = {'symbol': np.asarray(symbols, dtype=str)}
+        for name, values in details.items():
+            if isinstance(values, np.ndarray):
+                columns[name] = values[..., position_idx]
+            else:
+                columns[name] = np.asarray([values[i] for i in position_idx], dtype=str)
+        columns['price_impact'] = price_impacts
+        columns['impact_pct'] = impact_pcts
         
-        for discount in parameters['liquidity_discount']:
-            total_impact = 0
-            position_impacts = []
-            
-            for position in positions:
-                # Apply liquidity discount based on instrument liquidity
-                liquidity_score = position.get('liquidity_score', 0.5)  # 0-1 scale
-                effective_discount = discount * (1 - liquidity_score)
-                
-                market_value = position['market_value']
-                price_impact = -effective_discount * market_value
-                total_impact += price_impact
-                
-                position_impacts.append({
-                    'symbol': position['symbol'],
-                    'liquidity_score': liquidity_score,
-                    'effective_discount': effective_discount,
-                    'price_impact': price_impact,
-                    'impact_pct': (price_impact / market_value) * 100 if market_value > 0 else 0
-                })
-            
-            impacts.append({
-                'scenario_parameter': f"liquidity_discount_{discount*100}%",
-                'liquidity_discount': discount,
-                'portfolio_value_change': total_impact,
-                'position_impacts': position_impacts
-            })
+        records = np.empty(
+            (price_impacts.shape[0], len(position_idx)),
+            dtype=[(name, column.dtype) for name, column in columns.items()]
+        )
+        for name, column in columns.items():
+            records[name] = column
+        return records
+    
+    @staticmethod
+    def _records_to_json(records: np.ndarray) -> List[Dict]:
+        """Plain dicts for one row of impact records"""
+        names = records.dtype.names
+        return [dict(zip(names, values)) for values in records.tolist()]
+    
+    # Each shock returns its parameter entries, a (parameters x positions) price impact
+    # block, position detail columns and the mask of affected positions (None for all)
+    
+    def _interest_rate_shock(self, soa: Dict[str, Any], precomputed: Dict[str, Any]):
+        """Simulate interest rate shock"""
+        # Price impact = -Duration × Yield Change × Market Value, for every shift at once
+        impact_block = -np.outer(precomputed['yield_changes'], soa['durations'] * soa['market_values'])
         
-        return impacts
+        details = {'market_value': soa['market_values'], 'duration': soa['durations']}
+        return precomputed['entries'], impact_block, details, None
     
-    async def _inflation_shock(self, positions: List[Dict], parameters: Dict) -> List[Dict]:
-        """Simulate inflation shock"""
-        impacts = []
+    def _credit_spread_shock(self, soa: Dict[str, Any], precomputed: Dict[str, Any]):
+        """Simulate credit spread widening"""
+        # Impact = -Duration × Spread Change × Market Value, only for credit-sensitive instruments
+        spread_changes, impact_block = credit_spread_impacts(
+            precomputed['spread_increase_factors'], soa['credit_spreads'], soa['durations'],
+            soa['market_values'], soa['is_credit']
+        )
         
-        for inflation_increase in parameters['inflation_increase']:
-            total_impact = 0  
-            position_impacts = []
-            
-            for position in positions:
-                # Inflation-linked bonds benefit, others suffer
-                instrument_type = position.get('instrument_type', 'corporate_bond')
-                market_value = position['market_value']
-                
-                if 'inflation_linked' in instrument_type.lower():
-                    # Inflation-linked bonds benefit
-                    price_impact = (inflation_increase / 100) * market_value * 0.8
-                else:
-                    # Regular bonds suffer from higher rates
-                    duration = position.get('modified_duration', 5.0)
-                    # Assume 70% of inflation shock translates to rate increase
-                    rate_impact = inflation_increase * 0.7
-                    price_impact = -duration * (rate_impact / 100) * market_value
-                
-                total_impact += price_impact
-                
-                position_impacts.append({
-                    'symbol': position['symbol'],
-                    'instrument_type': instrument_type,
-                    'price_impact': price_impact,
-                    'impact_pct': (price_impact / market_value) * 100 if market_value > 0 else 0
-                })
-            
-            impacts.append({
-                'scenario_parameter': f"inflation_increase_{inflation_increase}%",
-                'inflation_increase': inflation_increase,
-                'portfolio_value_change': total_impact,
-                'position_impacts': position_impacts
-            })
+        details = {'current_spread': soa['credit_spreads'], 'spread_change': spread_changes}
+        return precomputed['entries'], impact_block, details, soa['is_credit']
+    
+    def _liquidity_shock(self, soa: Dict[str, Any], precomputed: Dict[str, Any]):
+        """Simulate liquidity crisis"""
+        # Apply liquidity discount based on instrument liquidity
+        effective_discounts = np.outer(precomputed['liquidity_discounts'], 1 - soa['liquidity_scores'])
+        impact_block = -effective_discounts * soa['market_values']
+        
+        details = {'liquidity_score': soa['liquidity_scores'], 'effective_discount': effective_discounts}
+        return precomputed['entries'], impact_block, details, None
+    
+    def _inflation_shock(self, soa: Dict[str, Any], precomputed: Dict[str, Any]):
+        """Simulate inflation shock"""
+        # Inflation-linked bonds benefit, regular bonds suffer from higher rates
+        impact_block = inflation_impacts(
+            precomputed['inflation_changes'], precomputed['rate_changes'], soa['durations'],
+            soa['market_values'], soa['inflation_linked']
+        )
         
-        return impacts
+        return precomputed['entries'], impact_block, {'instrument_type': soa['instrument_types']}, None
     
-    async def _default_shock(self, positions: List[Dict], parameters: Dict) -> List[Dict]:
+    def _default_shock(self, soa: Dict[str, Any], precomputed: Dict[str, Any]):
         """Simulate default cluster scenario"""
-        impacts = []
+        base_default_probs = DEFAULT_PROBABILITY_TABLE[soa['rating_codes']].astype(np.float32)
         
-        for multiplier in parameters['default_rate_multiplier']:
-            total_impact = 0
-            position_impacts = []
-            
-            for position in positions:
-                # Only credit-sensitive instruments affected
-                if position.get('instrument_type') in ['corporate_bond', 'cd', 'cp']:
-                    rating = position.get('rating', 'BBB')
-                    base_default_prob = self._get_default_probability(rating)
-                    
-                    # Increase default probability
-                    stressed_default_prob = min(base_default_prob * multiplier, 0.5)  # Cap at 50%
-                    
-                    # Loss given default assumption
-                    lgd = 0.6  # 60% loss given default
-                    expected_loss = stressed_default_prob * lgd
-                    
-                    market_value = position['market_value']
-                    price_impact = -expected_loss * market_value
-                    total_impact += price_impact
-                    
-                    position_impacts.append({
-                        'symbol': position['symbol'],
-                        'rating': rating,
-                        'base_default_prob': base_default_prob,
-                        'stressed_default_prob': stressed_default_prob,
-                        'expected_loss': expected_loss,
-                        'price_impact': price_impact,
-                        'impact_pct': (price_impact / market_value) * 100 if market_value > 0 else 0
-                    })
-            
-            impacts.append({
-                'scenario_parameter': f"default_multiplier_{multiplier}x",
-                'default_multiplier': multiplier,
-                'portfolio_value_change': total_impact,
-                'position_impacts': position_impacts
-            })
+        # Increase default probability, capped at 50%
+        stressed_default_probs = np.minimum(
+            np.outer(precomputed['default_rate_multipliers'], base_default_probs), 0.5
+        )
         
-        return impacts
+        # Loss given default assumption; only credit-sensitive instruments affected
+        lgd = 0.6  # 60% loss given default
+        expected_losses = stressed_default_probs * lgd
+        impact_block = np.where(soa['is_credit'], -expected_losses * soa['market_values'], 0.0)
+        
+        details = {
+            'rating': soa['ratings'],
+            'base_default_prob': base_default_probs,
+            'stressed_default_prob': stressed_default_probs,
+            'expected_loss': expected_losses
+        }
+        return precomputed['entries'], impact_block, details, soa['is_credit']
     
     def _get_default_probability(self, rating: str) -> float:
         """Get annual default probability by rating"""
-        default_probs = {
-            'AAA': 0.0001, 'AA+': 0.0002, 'AA': 0.0003, 'AA-': 0.0005,
-            'A+': 0.0008, 'A': 0.0012, 'A-': 0.0018,
-            'BBB+': 0.0025, 'BBB': 0.0035, 'BBB-': 0.0050,
-            'BB+': 0.0075, 'BB': 0.0125, 'BB-': 0.0200,
-            'B+': 0.0350, 'B': 0.0600, 'B-': 0.1000,
-            'CCC': 0.2000, 'CC': 0.3000, 'C': 0.5000
-        }
-        return default_probs.get(rating, 0.05)  # Default 5%
+        return float(DEFAULT_PROBABILITY_TABLE[RATING_CODES.get(rating, UNKNOWN_RATING_CODE)])
     
     def _calculate_scenario_summary(self, results: Dict, baseline_value: float) -> Dict[str, Any]:
         """Calculate summary statistics across scenarios"""
         try:
-            all_impacts = []
-            worst_case = {'scenario': '', 'impact': 0}
-            best_case = {'scenario': '', 'impact': 0}
+            impact_pcts = []
+            impact_labels = []
             
             for scenario_name, scenario_data in results.items():
                 if scenario_name == 'summary':
                     continue
-                    
+                
                 for impact in scenario_data.get('impacts', []):
-                    impact_pct = impact.get('portfolio_impact_pct', 0)
-                    all_impacts.append(impact_pct)
-                    
-                    if impact_pct < worst_case['impact']:
-                        worst_case = {
-                            'scenario': scenario_name,
-                            'parameter': impact.get('scenario_parameter', ''),
-                            'impact': impact_pct
-                        }
-                    
-                    if impact_pct > best_case['impact']:
-                        best_case = {
-                            'scenario': scenario_name,
-                            'parameter': impact.get('scenario_parameter', ''),
-                            'impact': impact_pct
-                        }
+                    impact_pcts.append(impact.get('portfolio_impact_pct', 0))
+                    impact_labels.append((scenario_name, impact.get('scenario_parameter', '')))
+            
+            worst_case = {'scenario': '', 'impact': 0}
+            best_case = {'scenario': '', 'impact': 0}
+            summary_stats = {
+                'average_impact': 0,
+                'impact_volatility': 0,
+                'percentile_95': 0,  # 5th percentile (worst 5%)
+                'percentile_99': 0   # 1st percentile (worst 1%)
+            }
+            
+            if impact_pcts:
+                a = np.asarray(impact_pcts, dtype=np.float64)
+                
+                # Worst and best cases only replace the zero-impact defaults when they cross zero
+                worst = int(a.argmin())
+                if a[worst] < 0:
+                    scenario_name, parameter = impact_labels[worst]
+                    worst_case = {'scenario': scenario_name, 'parameter': parameter, 'impact': float(a[worst])}
+                best = int(a.argmax())
+                if a[best] > 0:
+                    scenario_name, parameter = impact_labels[best]
+                    best_case = {'scenario': scenario_name, 'parameter': parameter, 'impact': float(a[best])}
+                
+                pct_5, pct_1 = (float(p) for p in partition_percentiles(a, (5.0, 1.0)))
+                summary_stats = {
+                    'average_impact': float(a.mean()),
+                    'impact_volatility': float(a.std()),
+                    'percentile_95': pct_5,
+                    'percentile_99': pct_1
+                }
             
             return {
                 'total_scenarios_tested': len([s for s in results.keys() if s != 'summary']),
                 'worst_case_scenario': worst_case,
                 'best_case_scenario': best_case,
-                'average_impact': np.mean(all_impacts) if all_impacts else 0,
-                'impact_volatility': np.std(all_impacts) if all_impacts else 0,
-                'percentile_95': np.percentile(all_impacts, 5) if all_impacts else 0,  # 5th percentile (worst 5%)
-                'percentile_99': np.percentile(all_impacts, 1) if all_impacts else 0   # 1st percentile (worst 1%)
+                **summary_stats
             }
             
         except Exception as e:
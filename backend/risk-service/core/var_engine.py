@@ -1,167 +1,120 @@
+import asyncio
+import time
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 from scipy import stats
 import structlog
 
+from ._risk_kernels import BATCH_VAR_COLUMNS, batch_var_metrics, warm_up_var_kernels
+
 logger = structlog.get_logger()
 
+# Normal quantiles for the 95% and 99% confidence levels
+Z_95 = float(stats.norm.ppf(0.05))  # -1.645
+Z_99 = float(stats.norm.ppf(0.01))  # -2.33
+
 class VaREngine:
     """Value at Risk calculation engine with multiple methodologies"""
     
     def __init__(self, settings):
         self.settings = settings
         
+        # Historical returns by portfolio: (fetched at, trading date, days, returns)
+        self._returns_cache: Dict[str, Tuple[float, date, int, np.ndarray]] = {}
+        self._returns_locks: Dict[str, asyncio.Lock] = {}
+        # Last VaR metrics by portfolio: (returns array, portfolio value, metrics); the cached
+        # returns array is read-only and replaced on refresh, so its identity versions the inputs
+        self._metrics_cache: Dict[str, Tuple[np.ndarray, float, Dict[str, float]]] = {}
+        
     async def initialize(self):
         logger.info("Initializing VaR Engine")
+        # On the event loop thread: Numba's workqueue pool for the parallel kernels
+        # must first be launched from the main thread, not from a worker thread
+        warm_up_var_kernels()
         
     async def calculate_portfolio_var(self, portfolio_id: str) -> Dict[str, float]:
         """Calculate VaR using multiple methods"""
         try:
-            # Get portfolio data
-            positions = await self._get_portfolio_positions(portfolio_id)
-            returns = await self._get_portfolio_returns(portfolio_id, days=252)
+            # Get portfolio data; positions and returns come from independent stores
+            positions, returns = await asyncio.gather(
+                self._get_portfolio_positions(portfolio_id),
+                self._get_portfolio_returns(portfolio_id, days=252)
+            )
             
-            if not returns or len(returns) < 30:
+            if returns is None or len(returns) < 30:
                 logger.warning(f"Insufficient data for VaR calculation: {portfolio_id}")
                 return self._default_var_metrics()
             
             portfolio_value = sum(pos['market_value'] for pos in positions)
-            returns_array = np.array(returns)
-            
-            # Calculate VaR using different methods
-            var_metrics = {}
-            
-            # Historical VaR
-            var_metrics.update(self._historical_var(returns_array, portfolio_value))
+            cached = self._metrics_cache.get(portfolio_id)
+            if cached is not None and cached[0] is returns and cached[1] == portfolio_value:
+                return dict(cached[2])
             
-            # Parametric VaR
-            var_metrics.update(self._parametric_var(returns_array, portfolio_value))
+            returns_array = np.asarray(returns, dtype=np.float64)
             
-            # Monte Carlo VaR
-            var_metrics.update(self._monte_carlo_var(returns_array, portfolio_value))
-            
-            # Expected Shortfall (Conditional VaR)
-            var_metrics.update(self._expected_shortfall(returns_array, portfolio_value))
+            # Historical VaR, Expected Shortfall (Conditional VaR), parametric and
+            # Monte Carlo VaR come from one fused kernel: one partition, one mean/std
+            metrics = await asyncio.to_thread(
+                self._fused_var_metrics, returns_array[None, :],
+                np.array([portfolio_value], dtype=np.float64)
+            )
+            var_metrics = dict(zip(BATCH_VAR_COLUMNS, metrics[0].tolist()))
+            self._metrics_cache[portfolio_id] = (returns, portfolio_value, var_metrics)
             
-            return var_metrics
+            return dict(var_metrics)
             
         except Exception as e:
             logger.error(f"VaR calculation failed for {portfolio_id}", error=str(e))
             return self._default_var_metrics()
     
-    def _historical_var(self, returns: np.ndarray, portfolio_value: float) -> Dict[str, float]:
-        """Historical simulation VaR"""
-        try:
-            # 1-day VaR
-            var_95 = np.percentile(returns, 5) * portfolio_value
-            var_99 = np.percentile(returns, 1) * portfolio_value
-            
-            # 10-day VaR (scaling)
-            var_95_10d = var_95 * np.sqrt(10)
-            var_99_10d = var_99 * np.sqrt(10)
-            
-            return {
-                'historical_var_95_1d': abs(var_95),
-                'historical_var_99_1d': abs(var_99),
-                'historical_var_95_10d': abs(var_95_10d),
-                'historical_var_99_10d': abs(var_99_10d)
-            }
-            
-        except Exception as e:
-            logger.error("Historical VaR calculation failed", error=str(e))
-            return {}
-    
-    def _parametric_var(self, returns: np.ndarray, portfolio_value: float) -> Dict[str, float]:
-        """Parametric (Normal distribution) VaR"""
-        try:
-            mean_return = np.mean(returns)
-            std_return = np.std(returns, ddof=1)
-            
-            # Z-scores for confidence levels
-            z_95 = stats.norm.ppf(0.05)  # -1.645
-            z_99 = stats.norm.ppf(0.01)  # -2.33
-            
-            # 1-day VaR
-            var_95 = (mean_return + z_95 * std_return) * portfolio_value
-            var_99 = (mean_return + z_99 * std_return) * portfolio_value
-            
-            # 10-day VaR
-            var_95_10d = (mean_return * 10 + z_95 * std_return * np.sqrt(10)) * portfolio_value
-            var_99_10d = (mean_return * 10 + z_99 * std_return * np.sqrt(10)) * portfolio_value
-            
-            return {
-                'parametric_var_95_1d': abs(var_95),
-                'parametric_var_99_1d': abs(var_99),
-                'parametric_var_95_10d': abs(var_95_10d),
-                'parametric_var_99_10d': abs(var_99_10d)
-            }
-            
-        except Exception as e:
-            logger.error("Parametric VaR calculation failed", error=str(e))
-            return {}
-    
-    def _monte_carlo_var(self, returns: np.ndarray, portfolio_value: float, 
-                        simulations: int = 10000) -> Dict[str, float]:
-        """Monte Carlo VaR simulation"""
-        try:
-            mean_return = np.mean(returns)
-            std_return = np.std(returns, ddof=1)
-            
-            # Generate random scenarios
-            np.random.seed(42)  # For reproducibility
-            simulated_returns = np.random.normal(mean_return, std_return, simulations)
-            simulated_values = simulated_returns * portfolio_value
-            
-            # Calculate VaR
-            var_95 = np.percentile(simulated_values, 5)
-            var_99 = np.percentile(simulated_values, 1)
-            
-            # 10-day scaling
-            simulated_returns_10d = np.random.normal(
-                mean_return * 10, 
-                std_return * np.sqrt(10), 
-                simulations
-            )
-            simulated_values_10d = simulated_returns_10d * portfolio_value
-            
-            var_95_10d = np.percentile(simulated_values_10d, 5)
-            var_99_10d = np.percentile(simulated_values_10d, 1)
-            
-            return {
-                'monte_carlo_var_95_1d': abs(var_95),
-                'monte_carlo_var_99_1d': abs(var_99),
-                'monte_carlo_var_95_10d': abs(var_95_10d),
-                'monte_carlo_var_99_10d': abs(var_99_10d)
-            }
-            
-        except Exception as e:
-            logger.error("Monte Carlo VaR calculation failed", error=str(e))
-            return {}
+    async def calculate_portfolio_vars_batch(self, portfolio_ids: List[str],
+                                             days: int = 252) -> Dict[str, Dict[str, float]]:
+        """Calculate VaR for many portfolios with one vectorized pass over a returns matrix"""
+        positions, returns = await asyncio.gather(
+            asyncio.gather(*(self._get_portfolio_positions(pid) for pid in portfolio_ids)),
+            asyncio.gather(*(self._get_portfolio_returns(pid, days=days) for pid in portfolio_ids))
+        )
+        
+        # Full-length histories stack into the matrix; anything else takes the single-portfolio path
+        batch_rows = [i for i, r in enumerate(returns) if r is not None and len(r) == days] if days >= 30 else []
+        results: Dict[str, Dict[str, float]] = {}
+        
+        if batch_rows:
+            try:
+                # float32 halves the bandwidth of the partition; means accumulate in float64
+                returns_matrix = np.empty((len(batch_rows), days), dtype=np.float32)
+                for row, i in enumerate(batch_rows):
+                    returns_matrix[row] = returns[i]
+                portfolio_values = np.array(
+                    [sum(pos['market_value'] for pos in positions[i]) for i in batch_rows],
+                    dtype=np.float64
+                )
+                
+                metrics = await asyncio.to_thread(self._fused_var_metrics, returns_matrix, portfolio_values)
+                
+                for row, i in enumerate(batch_rows):
+                    results[portfolio_ids[i]] = dict(zip(BATCH_VAR_COLUMNS, metrics[row].tolist()))
+                    
+            except Exception as e:
+                logger.error("Batch VaR calculation failed", error=str(e))
+                for i in batch_rows:
+                    results[portfolio_ids[i]] = self._default_var_metrics()
+        
+        for portfolio_id in portfolio_ids:
+            if portfolio_id not in results:
+                results[portfolio_id] = await self.calculate_portfolio_var(portfolio_id)
+        
+        return results
     
-    def _expected_shortfall(self, returns: np.ndarray, portfolio_value: float) -> Dict[str, float]:
-        """Expected Shortfall (Conditional VaR)"""
-        try:
-            # Sort returns
-            sorted_returns = np.sort(returns)
-            
-            # 95% Expected Shortfall
-            cutoff_95 = int(0.05 * len(sorted_returns))
-            es_95 = np.mean(sorted_returns[:cutoff_95]) * portfolio_value
-            
-            # 99% Expected Shortfall
-            cutoff_99 = int(0.01 * len(sorted_returns))
-            es_99 = np.mean(sorted_returns[:cutoff_99]) * portfolio_value
-            
-            return {
-                'expected_shortfall_95': abs(es_95),
-                'expected_shortfall_99': abs(es_99)
-            }
-            
-        except Exception as e:
-            logger.error("Expected Shortfall calculation failed", error=str(e))
-            return {}
+    def _fused_var_metrics(self, returns: np.ndarray, portfolio_values: np.ndarray,
+                           simulations: int = 10000) -> np.ndarray:
+        """Absolute VaR and Expected Shortfall per portfolio row, columns per BATCH_VAR_COLUMNS"""
+        # Monte Carlo draws are seeded for reproducibility
+        metrics = batch_var_metrics(
+            returns, portfolio_values, Z_95, Z_99, simulations, 42, self.settings.var_importance_shift
+        )
+        return np.abs(metrics, out=metrics)
     
     def _default_var_metrics(self) -> Dict[str, float]:
         """Default VaR metrics when calculation fails"""
@@ -185,9 +138,37 @@ class VaREngine:
             {'symbol': 'GSEC5Y', 'market_value': 5000000, 'quantity': 50}
         ]
     
-    async def _get_portfolio_returns(self, portfolio_id: str, days: int) -> List[float]:
-        """Get historical portfolio returns"""
+    async def _get_portfolio_returns(self, portfolio_id: str, days: int) -> np.ndarray:
+        """Get historical portfolio returns, reused for returns_cache_ttl seconds within a day"""
+        cached = self._returns_cache.get(portfolio_id)
+        if self._returns_fresh(cached, days):
+            return cached[3]
+        
+        # One fetch per portfolio at a time; concurrent callers wait and reuse it
+        lock = self._returns_locks.setdefault(portfolio_id, asyncio.Lock())
+        async with lock:
+            cached = self._returns_cache.get(portfolio_id)
+            if self._returns_fresh(cached, days):
+                return cached[3]
+            
+            returns = np.asarray(await self._fetch_portfolio_returns(portfolio_id, days), dtype=np.float64)
+            returns.flags.writeable = False  # shared between callers
+            self._returns_cache[portfolio_id] = (time.monotonic(), date.today(), days, returns)
+            return returns
+    
+    def _returns_fresh(self, cached: Optional[Tuple[float, date, int, np.ndarray]], days: int) -> bool:
+        """Whether a cached returns entry covers days and is from today within the TTL"""
+        if cached is None:
+            return False
+        fetched_at, fetched_on, cached_days, _ = cached
+        return (
+            cached_days == days
+            and fetched_on == date.today()
+            and time.monotonic() - fetched_at < self.settings.returns_cache_ttl
+        )
+    
+    async def _fetch_portfolio_returns(self, portfolio_id: str, days: int) -> np.ndarray:
+        """Fetch historical portfolio returns"""
         # This would fetch from timeseries database
         # Placeholder: generate synthetic returns
-        np.random.seed(42)
-        return np.random.normal(0.0001, 0.02, days).tolist()
+        return np.random.RandomState(42).normal(0.0001, 0.02, days)
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import random
+import time
 from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
@@ -7,10 +9,11 @@ from datetime import datetime, timedelta
 import structlog
 import uvicorn
 import numpy as np
-import pandas as pd
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from prometheus_client import Histogram
 
 from core.var_engine import VaREngine
 from core.stress_testing import StressTestingEngine
@@ -23,6 +26,10 @@ from models import *
 
 logger = structlog.get_logger()
 
+RISK_LOOP_DURATION = Histogram(
+    'risk_loop_duration_seconds', 'Duration of one background risk loop iteration', ['loop']
+)
+
 class RiskService:
     def __init__(self):
         self.settings = Settings()
@@ -44,6 +51,7 @@ class RiskService:
             await self.var_engine.initialize()
             await self.stress_engine.initialize()
             await self.limit_engine.initialize()
+            await self.concentration_engine.initialize()
             
             # Start background processing
             asyncio.create_task(self.risk_monitoring_loop())
@@ -61,6 +69,7 @@ class RiskService:
         """Stop risk service"""
         logger.info("Stopping Risk Service")
         self.running = False
+        await self.concentration_engine.close()
         await self.risk_db.close()
         await self.timeseries_db.close()
 
@@ -68,6 +77,8 @@ class RiskService:
         """Main risk monitoring loop"""
         while self.running:
             try:
+                started = time.monotonic()
+                
                 # Calculate VaR for all portfolios
                 await self.calculate_portfolio_vars()
                 
@@ -77,7 +88,7 @@ class RiskService:
                 # Calculate liquidity risk
                 await self.assess_liquidity_risks()
                 
-                await asyncio.sleep(300)  # Every 5 minutes
+                await self._sleep_until_next_run('risk_monitoring', 300, started)  # Every 5 minutes
                 
             except Exception as e:
                 logger.error("Risk monitoring error", error=str(e))
@@ -87,8 +98,9 @@ class RiskService:
         """Periodic stress testing"""
         while self.running:
             try:
+                started = time.monotonic()
                 await self.run_stress_tests()
-                await asyncio.sleep(3600)  # Every hour
+                await self._sleep_until_next_run('stress_testing', 3600, started)  # Every hour
                 
             except Exception as e:
                 logger.error("Stress testing error", error=str(e))
@@ -98,25 +110,50 @@ class RiskService:
         """Continuous limit monitoring"""
         while self.running:
             try:
+                started = time.monotonic()
                 await self.check_all_limits()
-                await asyncio.sleep(30)  # Every 30 seconds
+                await self._sleep_until_next_run('limit_checking', 30, started)  # Every 30 seconds
                 
             except Exception as e:
                 logger.error("Limit checking error", error=str(e))
                 await asyncio.sleep(60)
 
+    async def _sleep_until_next_run(self, loop_name: str, interval: float, started: float):
+        """Sleep out the rest of interval after a run that began at started, plus up to 10% jitter
+        so replicas do not hit the databases in lockstep"""
+        elapsed = time.monotonic() - started
+        RISK_LOOP_DURATION.labels(loop=loop_name).observe(elapsed)
+        if elapsed > interval:
+            logger.warning("Risk loop overran its interval", loop=loop_name, elapsed=elapsed, interval=interval)
+        
+        await asyncio.sleep(max(0.0, interval - elapsed) + random.uniform(0, interval * 0.1))
+
     async def calculate_portfolio_vars(self):
         """Calculate VaR for all portfolios"""
         try:
             portfolio_ids = await self.risk_db.get_active_portfolios()
             
-            for portfolio_id in portfolio_ids:
-                var_metrics = await self.var_engine.calculate_portfolio_var(portfolio_id)
-                await self.risk_db.store_var_metrics(portfolio_id, var_metrics)
-                
-                # Check VaR limits
-                if var_metrics['var_95'] > await self.get_var_limit(portfolio_id):
-                    await self.trigger_risk_alert(portfolio_id, 'var_breach', var_metrics)
+            # One vectorized pass over every portfolio's return history
+            portfolio_vars = await self.var_engine.calculate_portfolio_vars_batch(portfolio_ids)
+            
+            # Storing and limit checks are I/O-bound, so overlap them up to a bound
+            semaphore = asyncio.Semaphore(self.settings.var_calculation_concurrency)
+            
+            async def store_and_check(portfolio_id: str, var_metrics: Dict[str, float]):
+                async with semaphore:
+                    await self.risk_db.store_var_metrics(portfolio_id, var_metrics)
+                    
+                    # Check VaR limits
+                    if var_metrics['var_95'] > await self.get_var_limit(portfolio_id):
+                        await self.trigger_risk_alert(portfolio_id, 'var_breach', var_metrics)
+            
+            outcomes = await asyncio.gather(
+                *(store_and_check(pid, metrics) for pid, metrics in portfolio_vars.items()),
+                return_exceptions=True
+            )
+            for portfolio_id, outcome in zip(portfolio_vars, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.error("VaR update failed", portfolio_id=portfolio_id, error=str(outcome))
                     
         except Exception as e:
             logger.error("VaR calculation failed", error=str(e))
@@ -133,6 +170,7 @@ app = FastAPI(
     title="VedhaVriddhi Risk Management Service",
     description="Advanced risk analytics and monitoring",
     version="2.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -161,12 +199,14 @@ async def get_portfolio_risk(portfolio_id: str):
         risk_metrics = await risk_service.var_engine.calculate_portfolio_var(portfolio_id)
         concentration_metrics = await risk_service.concentration_engine.analyze_portfolio(portfolio_id)
         
-        return {
+        # Returned as a response so FastAPI skips its jsonable_encoder walk; orjson
+        # encodes the datetime and any NumPy values itself
+        return ORJSONResponse({
             "portfolio_id": portfolio_id,
             "var_metrics": risk_metrics,
             "concentration_metrics": concentration_metrics,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+            "timestamp": datetime.utcnow()
+        })
     except Exception as e:
         logger.error(f"Error getting portfolio risk for {portfolio_id}", error=str(e))
         raise HTTPException(status_code=500, detail="Risk calculation failed")
@@ -180,7 +220,7 @@ async def run_stress_test(request: StressTestRequest):
             request.scenarios,
             request.confidence_level
         )
-        return {"results": results}
+        return ORJSONResponse({"results": results})
     except Exception as e:
         logger.error("Stress test failed", error=str(e))
         raise HTTPException(status_code=500, detail="Stress test failed")
@@ -190,16 +230,32 @@ async def get_risk_limits(portfolio_id: str):
     """Get current risk limits and utilization"""
     try:
         limits = await risk_service.limit_engine.get_portfolio_limits(portfolio_id)
-        return {"limits": limits}
+        return ORJSONResponse({"limits": limits})
     except Exception as e:
         logger.error(f"Error getting limits for {portfolio_id}", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to get risk limits")
 
+@app.post("/risk/positions/{portfolio_id}")
+async def update_position(portfolio_id: str, update: PositionUpdate):
+    """Apply a position change to the maintained limit aggregates and recheck position limits"""
+    try:
+        violations = await risk_service.limit_engine.apply_position_update(portfolio_id, update.model_dump())
+        return ORJSONResponse({
+            "portfolio_id": portfolio_id,
+            "applied": violations is not None,
+            "violations": [violation.to_dict() for violation in violations or []]
+        })
+    except Exception as e:
+        logger.error(f"Error applying position update for {portfolio_id}", error=str(e))
+        raise HTTPException(status_code=500, detail="Failed to apply position update")
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8004,
+        loop="uvloop",
+        http="httptools",
         log_config=None,
         access_log=False,
         reload=False
@@ -51,6 +51,15 @@ class RiskLimit(BaseModel):
     threshold_breach: float
     last_updated: datetime
 
+class PositionUpdate(BaseModel):
+    symbol: str
+    market_value: float = Field(..., description="Current market value; 0 closes the position")
+    issuer: Optional[str] = None
+    sector: Optional[str] = None
+    rating: Optional[str] = None
+    maturity_date: Optional[str] = None
+    liquidity_score: float = Field(0.5, ge=0, le=1)
+
 class ConcentrationRisk(BaseModel):
     portfolio_id: str
     concentration_type: str = Field(..., description="issuer, sector, rating, maturity")
@@ -1,13 +1,44 @@
 import asyncio
-from typing import Dict, List, Optional, Any
-from decimal import Decimal
+import heapq
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
+from decimal import ROUND_HALF_EVEN, Decimal
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
 import structlog
 
 logger = structlog.get_logger()
 
+# Fee and conversion arithmetic runs on integers: amounts in micro-units, rates in nano-units
+AMOUNT_SCALE = 10**6
+RATE_SCALE = 10**9
+
+def _to_units(amount: Decimal) -> int:
+    """Decimal amount to integer micro-units"""
+    return int((amount * AMOUNT_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+def _from_units(units: int) -> Decimal:
+    """Integer micro-units back to a Decimal amount"""
+    return Decimal(units).scaleb(-6)
+
+@lru_cache(maxsize=256)
+def _rate_units(rate: float) -> int:
+    """Nano-unit form of a float rate or fee; keyed by value, so updated rates never read stale entries"""
+    return int((Decimal(str(rate)) * RATE_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+def _apply_rate(units: int, rate_units: int) -> int:
+    """Multiply micro-units by a nano-unit rate, rounding half to even like _to_units"""
+    quotient, remainder = divmod(units * rate_units, RATE_SCALE)
+    if 2 * remainder > RATE_SCALE or (2 * remainder == RATE_SCALE and quotient & 1):
+        quotient += 1
+    return quotient
+
+# Fee charged on CBDC-to-CBDC conversions (0.05%)
+CONVERSION_FEE_RATE_UNITS = _rate_units(0.0005)
+
 class CBDCType(Enum):
     DIGITAL_USD = "DUSD"
     DIGITAL_EUR = "DEUR"
@@ -42,13 +73,92 @@ class CBDCTransaction:
     settlement_time: Optional[datetime] = None
     compliance_data: Dict[str, Any] = None
 
+class CBDCBatcher:
+    """Coalesces concurrent transfers to one central bank into bulk API calls"""
+    
+    MAX_BATCH_SIZE = 64
+    MAX_WAIT_MS = 20
+    QUEUE_SIZE = 512
+    CALLER_TIMEOUT_S = 30.0
+    
+    def __init__(self, hub: 'CBDCIntegrationHub', central_bank: CentralBankConnection):
+        self.hub = hub
+        self.central_bank = central_bank
+        # Bounded so a slow central bank applies back-pressure instead of growing memory
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def submit(self, transaction: CBDCTransaction) -> Dict:
+        """Queue a transfer for the next bulk call and return its execution result"""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((transaction, fut))
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain_loop())
+        
+        return await asyncio.wait_for(fut, self.CALLER_TIMEOUT_S)
+    
+    async def _drain_loop(self):
+        """Send up to MAX_BATCH_SIZE queued transfers per call, waiting at most MAX_WAIT_MS to fill a batch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[CBDCTransaction, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + self.MAX_WAIT_MS / 1000
+            
+            while len(batch) < self.MAX_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Callers that already timed out are not sent
+            batch = [(transaction, fut) for transaction, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            
+            try:
+                results = await self.hub._execute_cbdc_transfer_batch(
+                    self.central_bank, [transaction for transaction, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batched CBDC transfer failed for {self.central_bank.bank_id}", error=str(e))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+            
+            # A short reply must not leave the remaining callers waiting for their timeout
+            if len(results) < len(batch):
+                error = RuntimeError(f"Central bank returned {len(results)} results for {len(batch)} transfers")
+                logger.error(f"Batched CBDC transfer incomplete for {self.central_bank.bank_id}", error=str(error))
+                for _, fut in batch[len(results):]:
+                    if not fut.done():
+                        fut.set_exception(error)
+
 class CBDCIntegrationHub:
     """Central Bank Digital Currency Integration Hub"""
     
+    PENDING_TIMEOUT_S = 300  # 5 minutes
+    TRANSACTION_HISTORY_MAX = 10000
+    
     def __init__(self):
         self.central_banks: Dict[str, CentralBankConnection] = {}
         self.active_transactions: Dict[str, CBDCTransaction] = {}
-        self.exchange_rates: Dict[str, float] = {}
+        # Settled and timed-out transactions, most recent last
+        self.transaction_history: Deque[CBDCTransaction] = deque(maxlen=self.TRANSACTION_HISTORY_MAX)
+        # Min-heap of (monotonic expiry time, transaction_id) for pending transactions
+        self._pending_expiry: List[Tuple[float, str]] = []
+        self.batchers: Dict[str, CBDCBatcher] = {}
+        self._by_cbdc: Dict[CBDCType, CentralBankConnection] = {}
+        # Keyed by (from, to) CBDC type, so lookups hash a tuple instead of formatting a string
+        self.exchange_rates: Dict[Tuple[CBDCType, CBDCType], float] = {}
         self.compliance_engine = ComplianceEngine()
         
     async def initialize(self):
@@ -117,6 +227,18 @@ class CBDCIntegrationHub:
                 transaction_fee=0.001  # 0.1% transaction fee
             )
             self.central_banks[config['bank_id']] = connection
+            self.batchers[config['bank_id']] = CBDCBatcher(self, connection)
+        
+        self._index_central_banks()
+    
+    def _index_central_banks(self):
+        """Rebuild the CBDC type to active central bank index; call after changing central_banks"""
+        by_cbdc: Dict[CBDCType, CentralBankConnection] = {}
+        for bank in self.central_banks.values():
+            # First active bank per CBDC type wins, as in the previous linear scan
+            if bank.active:
+                by_cbdc.setdefault(bank.cbdc_type, bank)
+        self._by_cbdc = by_cbdc
     
     async def execute_institutional_transfer(self,
                                            from_account: str,
@@ -126,10 +248,12 @@ class CBDCIntegrationHub:
                                            compliance_data: Dict) -> Dict:
         """Execute institutional CBDC transfer"""
         try:
-            transaction_id = f"cbdc_{datetime.utcnow().timestamp()}"
+            # One clock read per request, shared by the ID and the transaction record
+            now = datetime.utcnow()
+            transaction_id = f"cbdc_{now.timestamp()}"
             
             # Find appropriate central bank
-            central_bank = await self._get_central_bank_for_cbdc(cbdc_type)
+            central_bank = self._get_central_bank_for_cbdc(cbdc_type)
             if not central_bank:
                 raise ValueError(f"CBDC type {cbdc_type.value} not supported")
             
@@ -146,7 +270,7 @@ class CBDCIntegrationHub:
                 raise ValueError(f"Compliance check failed: {compliance_result['reason']}")
             
             # Calculate fees
-            fee = amount * Decimal(str(central_bank.transaction_fee))
+            fee = _from_units(_apply_rate(_to_units(amount), _rate_units(central_bank.transaction_fee)))
             
             # Create transaction record
             transaction = CBDCTransaction(
@@ -157,18 +281,23 @@ class CBDCIntegrationHub:
                 amount=amount,
                 fee=fee,
                 status='pending',
-                timestamp=datetime.utcnow(),
+                timestamp=now,
                 compliance_data=compliance_data
             )
             
             self.active_transactions[transaction_id] = transaction
+            heapq.heappush(
+                self._pending_expiry,
+                (time.monotonic() + self.PENDING_TIMEOUT_S, transaction_id)
+            )
             
-            # Execute transfer through central bank
-            execution_result = await self._execute_cbdc_transfer(central_bank, transaction)
+            # Execute transfer through central bank, batched with concurrent transfers
+            execution_result = await self.batchers[central_bank.bank_id].submit(transaction)
             
             # Update transaction status
             transaction.status = 'completed' if execution_result['success'] else 'failed'
-            transaction.settlement_time = datetime.utcnow()
+            transaction.settlement_time = execution_result.get('settlement_time') or datetime.utcnow()
+            self._retire_transaction(transaction_id)
             
             return {
                 'transfer_id': transaction_id,
@@ -183,28 +312,34 @@ class CBDCIntegrationHub:
             logger.error("CBDC transfer execution failed", error=str(e))
             raise
     
-    async def _execute_cbdc_transfer(self, central_bank: CentralBankConnection, transaction: CBDCTransaction) -> Dict:
-        """Execute transfer through central bank API"""
+    async def _execute_cbdc_transfer_batch(self, central_bank: CentralBankConnection,
+                                           transactions: List[CBDCTransaction]) -> List[Dict]:
+        """Execute transfers through one bulk central bank API call"""
         try:
-            # Mock central bank API call
+            # Mock bulk call to f"{central_bank.api_endpoint}/batch"
             await asyncio.sleep(0.1)  # Simulate API call time
             
-            # Simulate successful transfer
-            confirmation_number = f"CB_{transaction.transaction_id}_{datetime.utcnow().timestamp()}"
-            
-            return {
-                'success': True,
-                'confirmation_number': confirmation_number,
-                'settlement_time': datetime.utcnow(),
-                'network_fee': 0.0001  # Mock network fee
-            }
+            # Simulate successful transfers
+            settlement_time = datetime.utcnow()
+            return [
+                {
+                    'success': True,
+                    'confirmation_number': f"CB_{transaction.transaction_id}_{settlement_time.timestamp()}",
+                    'settlement_time': settlement_time,
+                    'network_fee': 0.0001  # Mock network fee
+                }
+                for transaction in transactions
+            ]
             
         except Exception as e:
             logger.error(f"CBDC transfer failed for {central_bank.bank_id}", error=str(e))
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            return [
+                {
+                    'success': False,
+                    'error': str(e)
+                }
+                for _ in transactions
+            ]
     
     async def convert_cbdc(self,
                           from_cbdc: CBDCType,
@@ -212,7 +347,8 @@ class CBDCIntegrationHub:
                           amount: Decimal) -> Dict:
         """Convert between different CBDCs"""
         try:
-            conversion_id = f"conv_{datetime.utcnow().timestamp()}"
+            now = datetime.utcnow()
+            conversion_id = f"conv_{now.timestamp()}"
             
             # Get exchange rate
             exchange_rate = await self._get_exchange_rate(from_cbdc, to_cbdc)
@@ -220,11 +356,11 @@ class CBDCIntegrationHub:
                 raise ValueError(f"No exchange rate available for {from_cbdc.value} to {to_cbdc.value}")
             
             # Calculate converted amount
-            converted_amount = amount * Decimal(str(exchange_rate))
+            converted_units = _apply_rate(_to_units(amount), _rate_units(exchange_rate))
             
             # Calculate conversion fee (0.05% for CBDC conversions)
-            conversion_fee = converted_amount * Decimal('0.0005')
-            net_amount = converted_amount - conversion_fee
+            fee_units = _apply_rate(converted_units, CONVERSION_FEE_RATE_UNITS)
+            net_units = converted_units - fee_units
             
             return {
                 'conversion_id': conversion_id,
@@ -232,9 +368,9 @@ class CBDCIntegrationHub:
                 'to_cbdc': to_cbdc.value,
                 'input_amount': float(amount),
                 'exchange_rate': exchange_rate,
-                'output_amount': float(net_amount),
-                'conversion_fee': float(conversion_fee),
-                'timestamp': datetime.utcnow().isoformat()
+                'output_amount': net_units / AMOUNT_SCALE,
+                'conversion_fee': fee_units / AMOUNT_SCALE,
+                'timestamp': now.isoformat()
             }
             
         except Exception as e:
@@ -244,7 +380,7 @@ class CBDCIntegrationHub:
     async def get_cbdc_balance(self, account_id: str, cbdc_type: CBDCType) -> Decimal:
         """Get CBDC balance for account"""
         try:
-            central_bank = await self._get_central_bank_for_cbdc(cbdc_type)
+            central_bank = self._get_central_bank_for_cbdc(cbdc_type)
             if not central_bank:
                 return Decimal('0')
             
@@ -258,17 +394,13 @@ class CBDCIntegrationHub:
             logger.error("CBDC balance query failed", error=str(e))
             return Decimal('0')
     
-    async def _get_central_bank_for_cbdc(self, cbdc_type: CBDCType) -> Optional[CentralBankConnection]:
+    def _get_central_bank_for_cbdc(self, cbdc_type: CBDCType) -> Optional[CentralBankConnection]:
         """Get central bank connection for CBDC type"""
-        for bank in self.central_banks.values():
-            if bank.cbdc_type == cbdc_type and bank.active:
-                return bank
-        return None
+        return self._by_cbdc.get(cbdc_type)
     
     async def _get_exchange_rate(self, from_cbdc: CBDCType, to_cbdc: CBDCType) -> Optional[float]:
         """Get exchange rate between CBDCs"""
-        rate_key = f"{from_cbdc.value}_{to_cbdc.value}"
-        return self.exchange_rates.get(rate_key, 1.0)  # Mock 1:1 rate
+        return self.exchange_rates.get((from_cbdc, to_cbdc), 1.0)  # Mock 1:1 rate
     
     async def _update_exchange_rates(self):
         """Update CBDC exchange rates"""
@@ -276,12 +408,12 @@ class CBDCIntegrationHub:
             try:
                 # Mock exchange rate updates
                 self.exchange_rates.update({
-                    'DUSD_DEUR': 0.85,
-                    'DEUR_DUSD': 1.18,
-                    'DUSD_DCNY': 7.20,
-                    'DCNY_DUSD': 0.14,
-                    'DUSD_eINR': 83.0,
-                    'eINR_DUSD': 0.012
+                    (CBDCType.DIGITAL_USD, CBDCType.DIGITAL_EUR): 0.85,
+                    (CBDCType.DIGITAL_EUR, CBDCType.DIGITAL_USD): 1.18,
+                    (CBDCType.DIGITAL_USD, CBDCType.DIGITAL_CNY): 7.20,
+                    (CBDCType.DIGITAL_CNY, CBDCType.DIGITAL_USD): 0.14,
+                    (CBDCType.DIGITAL_USD, CBDCType.E_RUPEE): 83.0,
+                    (CBDCType.E_RUPEE, CBDCType.DIGITAL_USD): 0.012
                 })
                 
                 await asyncio.sleep(60)  # Update every minute
@@ -290,19 +422,26 @@ class CBDCIntegrationHub:
                 logger.error("Exchange rate update error", error=str(e))
                 await asyncio.sleep(300)
     
+    def _retire_transaction(self, transaction_id: str):
+        """Move a transaction that is no longer pending into the bounded history"""
+        transaction = self.active_transactions.pop(transaction_id, None)
+        if transaction is not None:
+            self.transaction_history.append(transaction)
+    
     async def _monitor_transactions(self):
         """Monitor active CBDC transactions"""
         while True:
             try:
-                # Check for failed or stuck transactions
-                current_time = datetime.utcnow()
+                # Only transactions whose expiry has passed are inspected
+                now = time.monotonic()
                 
-                for transaction_id, transaction in list(self.active_transactions.items()):
-                    if transaction.status == 'pending':
-                        # Check if transaction has been pending too long
-                        if (current_time - transaction.timestamp).seconds > 300:  # 5 minutes
-                            transaction.status = 'timeout'
-                            logger.warning(f"Transaction {transaction_id} timed out")
+                while self._pending_expiry and self._pending_expiry[0][0] <= now:
+                    _, transaction_id = heapq.heappop(self._pending_expiry)
+                    transaction = self.active_transactions.get(transaction_id)
+                    if transaction is not None and transaction.status == 'pending':
+                        transaction.status = 'timeout'
+                        self._retire_transaction(transaction_id)
+                        logger.warning(f"Transaction {transaction_id} timed out")
                 
                 await asyncio.sleep(30)  # Check every 30 seconds
                 
@@ -313,11 +452,16 @@ class CBDCIntegrationHub:
 class ComplianceEngine:
     """CBDC compliance and regulatory engine"""
     
+    KYC_REQUIRED_FIELDS = ('customer_id', 'institution_type', 'jurisdiction')
+    AML_REVIEW_THRESHOLD = Decimal('1000000')  # Large transaction
+    REGULATORY_DAILY_LIMIT = Decimal('50000000')  # $50M daily limit
+    
     async def initialize(self):
         """Initialize compliance engine"""
         self.aml_rules = {}
         self.kyc_requirements = {}
         self.regulatory_limits = {}
+        self._kyc_required = frozenset(self.KYC_REQUIRED_FIELDS)
     
     async def validate_transaction(self,
                                  from_account: str,
@@ -327,18 +471,20 @@ class ComplianceEngine:
                                  compliance_data: Dict) -> Dict:
         """Validate transaction for compliance"""
         try:
-            # AML checks
-            aml_result = await self._check_aml(from_account, to_account, amount)
+            # AML, KYC and regulatory limit checks are independent, so run them together
+            aml_result, kyc_result, limits_check = await asyncio.gather(
+                self._check_aml(from_account, to_account, amount),
+                self._verify_kyc(from_account, to_account, compliance_data),
+                self._check_regulatory_limits(amount, cbdc_type)
+            )
+            
+            # Failures are reported in AML, KYC, limits order
             if not aml_result['passed']:
                 return {'approved': False, 'reason': aml_result['reason']}
             
-            # KYC verification
-            kyc_result = await self._verify_kyc(from_account, to_account, compliance_data)
             if not kyc_result['verified']:
                 return {'approved': False, 'reason': kyc_result['reason']}
             
-            # Regulatory limits
-            limits_check = await self._check_regulatory_limits(amount, cbdc_type)
             if not limits_check['compliant']:
                 return {'approved': False, 'reason': limits_check['reason']}
             
@@ -351,24 +497,24 @@ class ComplianceEngine:
     async def _check_aml(self, from_account: str, to_account: str, amount: Decimal) -> Dict:
         """Anti-Money Laundering checks"""
         # Mock AML checks
-        if amount > Decimal('1000000'):  # Large transaction
+        if amount > self.AML_REVIEW_THRESHOLD:
             return {'passed': True, 'risk_level': 'high', 'reason': 'High-value transaction flagged for review'}
         return {'passed': True, 'risk_level': 'low'}
     
     async def _verify_kyc(self, from_account: str, to_account: str, compliance_data: Dict) -> Dict:
         """Know Your Customer verification"""
         # Mock KYC verification
-        required_fields = ['customer_id', 'institution_type', 'jurisdiction']
-        for field in required_fields:
-            if field not in compliance_data:
-                return {'verified': False, 'reason': f'Missing required field: {field}'}
+        missing = self._kyc_required.difference(compliance_data)
+        if missing:
+            field = next(field for field in self.KYC_REQUIRED_FIELDS if field in missing)
+            return {'verified': False, 'reason': f'Missing required field: {field}'}
         
         return {'verified': True, 'verification_level': 'institutional'}
     
     async def _check_regulatory_limits(self, amount: Decimal, cbdc_type: CBDCType) -> Dict:
         """Check regulatory transaction limits"""
         # Mock regulatory limits
-        daily_limit = Decimal('50000000')  # $50M daily limit
+        daily_limit = self.REGULATORY_DAILY_LIMIT
         if amount > daily_limit:
             return {'compliant': False, 'reason': f'Amount exceeds daily regulatory limit of {daily_limit}'}
         
@@ -0,0 +1,116 @@
+import importlib.util
+import random
+from decimal import ROUND_HALF_EVEN, Decimal
+from pathlib import Path
+
+import pytest
+
+# The service directory name is not importable as a package, so load the module from its path
+_MODULE_PATH = Path(__file__).resolve().parents[1] / "backend" / "universal-defi-service" / "core" / "cbdc_integration.py"
+_spec = importlib.util.spec_from_file_location("cbdc_integration", _MODULE_PATH)
+cbdc = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cbdc)
+
+MICRO = Decimal('1e-6')
+
+def quantize(value: Decimal) -> Decimal:
+    return value.quantize(MICRO, rounding=ROUND_HALF_EVEN)
+
+def integer_fee(amount: Decimal, rate: float) -> Decimal:
+    return cbdc._from_units(cbdc._apply_rate(cbdc._to_units(amount), cbdc._rate_units(rate)))
+
+class TestFixedPointHelpers:
+
+    def test_apply_rate_rounds_half_to_even(self):
+        """Exact half micro-units round to the even neighbour"""
+        half = cbdc.RATE_SCALE // 2
+        assert cbdc._apply_rate(1, half) == 0
+        assert cbdc._apply_rate(3, half) == 2
+        assert cbdc._apply_rate(5, half) == 2
+        assert cbdc._apply_rate(7, half) == 4
+
+    def test_apply_rate_matches_decimal_half_even(self):
+        """Integer rounding agrees with Decimal ROUND_HALF_EVEN"""
+        rng = random.Random(7)
+        for _ in range(5000):
+            units = rng.randrange(0, 10**12)
+            rate_units = rng.randrange(0, 10 * cbdc.RATE_SCALE)
+            expected = (Decimal(units) * rate_units / cbdc.RATE_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN)
+            assert cbdc._apply_rate(units, rate_units) == int(expected)
+
+    def test_rate_units_resolution(self):
+        """Rates are held to nine decimal places"""
+        assert cbdc._rate_units(0.001) == 1_000_000
+        assert cbdc._rate_units(0.123456789) == 123_456_789
+        assert cbdc._rate_units(1e-9) == 1
+        assert cbdc._rate_units(1.0000000005) == 1_000_000_000
+        assert cbdc._rate_units(1.0000000015) == 1_000_000_002
+
+    def test_sub_micro_amounts_round_half_even(self):
+        """Amounts below a micro-unit round to the nearest micro-unit"""
+        assert cbdc._to_units(Decimal('0.0000005')) == 0
+        assert cbdc._to_units(Decimal('0.0000015')) == 2
+        assert cbdc._to_units(Decimal('1.0000005')) == 1_000_000
+        assert cbdc._from_units(1_000_001) == Decimal('1.000001')
+
+class TestTransferFee:
+
+    @pytest.mark.parametrize("amount", ['100.5', '1', '0.000001', '123456789.123456', '999999.999999'])
+    def test_matches_decimal_fee(self, amount):
+        """Micro-unit amounts give the previous Decimal fee, rounded to a micro-unit"""
+        amount = Decimal(amount)
+        assert integer_fee(amount, 0.001) == quantize(amount * Decimal('0.001'))
+
+    @pytest.mark.parametrize("amount", ['1.0000005', '0.0000004', '0.0000006', '42.1234567891'])
+    def test_sub_micro_amounts_within_one_micro_unit(self, amount):
+        """Sub-micro amounts stay within one micro-unit of the previous Decimal fee"""
+        amount = Decimal(amount)
+        assert abs(integer_fee(amount, 0.001) - amount * Decimal('0.001')) <= MICRO
+
+    def test_nano_unit_fee_rate(self):
+        """Fee rates with nine decimal places are applied exactly"""
+        amount = Decimal('1000000')
+        assert integer_fee(amount, 0.000000123) == quantize(amount * Decimal('0.000000123'))
+
+@pytest.mark.asyncio
+class TestConvertCBDC:
+
+    @staticmethod
+    async def convert(rate: float, amount: Decimal):
+        hub = cbdc.CBDCIntegrationHub()
+        hub.exchange_rates[(cbdc.CBDCType.DIGITAL_USD, cbdc.CBDCType.DIGITAL_EUR)] = rate
+        return await hub.convert_cbdc(cbdc.CBDCType.DIGITAL_USD, cbdc.CBDCType.DIGITAL_EUR, amount)
+
+    @pytest.mark.parametrize("rate,amount", [
+        (0.85, '100'),
+        (1.18, '2500.75'),
+        (83.0, '0.000001'),
+        (0.012, '31415.926535'),
+        (0.123456789, '987654.321')
+    ])
+    async def test_matches_decimal_conversion(self, rate, amount):
+        """Output and fee match the previous Decimal results rounded to a micro-unit"""
+        amount = Decimal(amount)
+        result = await self.convert(rate, amount)
+
+        converted = quantize(amount * Decimal(str(rate)))
+        fee = quantize(converted * Decimal('0.0005'))
+        assert result['conversion_fee'] == float(fee)
+        assert result['output_amount'] == float(converted - fee)
+
+    async def test_known_values(self):
+        """100 DUSD at 0.85 converts to 84.9575 net of a 0.0425 fee"""
+        result = await self.convert(0.85, Decimal('100'))
+        assert result['output_amount'] == 84.9575
+        assert result['conversion_fee'] == 0.0425
+
+    @pytest.mark.parametrize("amount", ['0.0000004', '1.0000005', '7.7777777777'])
+    async def test_sub_micro_amounts_within_one_micro_unit(self, amount):
+        """Sub-micro inputs stay within one micro-unit of the previous Decimal outputs"""
+        amount = Decimal(amount)
+        result = await self.convert(0.85, amount)
+
+        converted = amount * Decimal('0.85')
+        fee = converted * Decimal('0.0005')
+        assert abs(Decimal(str(result['conversion_fee'])) - fee) <= MICRO
+        assert abs(Decimal(str(result['output_amount'])) - (converted - fee)) <= 2 * MICRO
@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import asyncpg
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "risk-service"))
+
+from core.concentration_risk import (
+    EXPOSURE_DIMENSIONS,
+    EXPOSURE_QUERY,
+    POSITION_COLUMNS,
+    POSITION_DEFAULTS,
+    POSITIONS_QUERY,
+    ConcentrationRiskEngine
+)
+
+ROWS = [
+    ('GSEC10Y', 600.0, 'Government of India', 'Government', 'AAA', 'INR', '2034-06-15'),
+    ('CORP_AA', 300.0, 'ABC Corporation', 'Financial Services', 'AA', 'INR', '2027-12-31'),
+    ('CORP_NR', 100.0, None, None, None, None, None)
+]
+
+def grouping_set_rows(rows):
+    """Rows EXPOSURE_QUERY returns for the given positions, in arbitrary group order"""
+    positions = [dict(zip(POSITION_COLUMNS, row)) for row in rows]
+    for position in positions:
+        for column, default in POSITION_DEFAULTS.items():
+            if position[column] is None:
+                position[column] = default
+
+    result = []
+    for dimension in EXPOSURE_DIMENSIONS:
+        for key in sorted({position[dimension] for position in positions}, reverse=True):
+            group = [position for position in positions if position[dimension] == key]
+            row = dict.fromkeys(EXPOSURE_DIMENSIONS)
+            row.update({
+                dimension: key,
+                'market_value_minor': sum(round(position['market_value'] * 100) for position in group),
+                'position_count': len(group),
+                'unique_issuers': len({position['issuer'] for position in group}),
+                'instruments': sorted(position['symbol'] for position in group)
+            })
+            result.append(row)
+    return result
+
+class StubConnection:
+    """asyncpg connection double answering the positions and exposure queries"""
+
+    def __init__(self, rows=None, error=None):
+        self.rows = rows
+        self.error = error
+        self.queries = []
+        self.transactions = []
+
+    def transaction(self, **kwargs):
+        self.transactions.append(kwargs)
+        return StubTransaction()
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        if self.error is not None:
+            raise self.error
+        if query == EXPOSURE_QUERY:
+            return grouping_set_rows(self.rows)
+        return self.rows
+
+class StubTransaction:
+    """Transaction context that commits nothing"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class StubPool:
+    """asyncpg pool double handing out a single connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+def make_engine(conn):
+    engine = ConcentrationRiskEngine(SimpleNamespace(cache_ttl=60))
+    engine.db_pool = StubPool(conn)
+    return engine
+
+@pytest.mark.asyncio
+class TestPositionStore:
+
+    async def test_reads_positions_and_exposures_in_one_snapshot(self):
+        """Positions and grouped exposures are read in one repeatable-read transaction"""
+        conn = StubConnection(rows=ROWS)
+        positions, exposure_rows = await make_engine(conn)._load_portfolio('PF1')
+
+        assert list(positions.columns) == POSITION_COLUMNS
+        assert positions['symbol'].tolist() == ['GSEC10Y', 'CORP_AA', 'CORP_NR']
+        assert [query for query, _ in conn.queries] == [POSITIONS_QUERY, EXPOSURE_QUERY]
+        assert all(args == ('PF1',) for _, args in conn.queries)
+        assert conn.transactions == [{'isolation': 'repeatable_read', 'readonly': True}]
+        assert len(exposure_rows) == 10
+
+    async def test_grouped_rows_match_local_aggregation(self):
+        """Postgres-grouped exposures equal the frames grouped from the loaded positions"""
+        engine = make_engine(StubConnection(rows=ROWS))
+        positions, exposure_rows = await engine._load_portfolio('PF1')
+        df = engine._prepare_positions(positions)
+
+        pushed = engine._exposures_from_rows(exposure_rows, df)
+        local = engine._aggregate_exposures(df)
+        for dimension in EXPOSURE_DIMENSIONS:
+            pd.testing.assert_frame_equal(pushed[dimension], local[dimension], check_dtype=False)
+
+    async def test_analysis_uses_pool_positions(self):
+        """Analysis is computed over the rows the pool returned"""
+        analysis = await make_engine(StubConnection(rows=ROWS)).analyze_portfolio('PF1')
+
+        assert 'error' not in analysis
+        assert analysis['total_value'] == 1000.0
+        issuer = analysis['concentration_by_issuer']
+        assert issuer['total_issuers'] == 3
+        assert issuer['max_single_issuer_pct'] == pytest.approx(60.0)
+
+    async def test_missing_positions_table_falls_back_to_placeholder(self):
+        """A store without the positions table still yields an analysis"""
+        conn = StubConnection(error=asyncpg.UndefinedTableError('relation "positions" does not exist'))
+        engine = make_engine(conn)
+
+        positions, exposure_rows = await engine._load_portfolio('PF1')
+        assert positions.equals(ConcentrationRiskEngine._placeholder_positions())
+        assert exposure_rows is None
+
+        analysis = await engine.analyze_portfolio('PF1')
+        assert 'error' not in analysis
+        assert analysis['total_value'] == float(positions['market_value'].sum())
+
+    async def test_other_database_errors_surface(self):
+        """Errors other than a missing table are reported, not masked"""
+        conn = StubConnection(error=asyncpg.PostgresConnectionError('connection lost'))
+        analysis = await make_engine(conn).analyze_portfolio('PF1')
+
+        assert 'connection lost' in analysis['error']
@@ -0,0 +1,163 @@
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "risk-service"))
+
+from core.limit_monitoring import LimitMonitoringEngine
+
+def make_settings(**overrides):
+    settings = {
+        'violation_history_max': 100,
+        'limit_check_concurrency': 2,
+        'limit_check_page_size': 10,
+        'position_state_max': 100,
+        'position_state_ttl': 300
+    }
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+def position(symbol, market_value, issuer, sector='Banking', rating='AA', liquidity_score=0.9):
+    return {
+        'symbol': symbol,
+        'market_value': market_value,
+        'issuer': issuer,
+        'sector': sector,
+        'rating': rating,
+        'liquidity_score': liquidity_score
+    }
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = LimitMonitoringEngine(make_settings())
+    await engine.initialize()
+    return engine
+
+@pytest.mark.asyncio
+class TestPositionEncoding:
+
+    async def test_codes_are_per_portfolio(self, engine):
+        """Group arrays are sized by each portfolio's own distinct values"""
+        wide = engine._positions_soa([position(f'S{i}', 10.0, f'Issuer {i}') for i in range(50)])
+        narrow = engine._positions_soa([position('A', 60.0, 'Alpha'), position('B', 40.0, 'Beta')])
+
+        assert engine._aggregate_positions(wide).by_issuer.size == 50
+        aggregates = engine._aggregate_positions(narrow)
+        assert aggregates.by_issuer.tolist() == [60.0, 40.0]
+        assert aggregates.names['issuer'].tolist() == ['Alpha', 'Beta']
+
+    async def test_missing_classification_uses_defaults(self, engine):
+        """Positions without issuer, sector or rating fall into the default groups"""
+        soa = engine._positions_soa([{'symbol': 'X', 'market_value': 5.0}])
+
+        assert soa['names']['issuer'].tolist() == ['Unknown']
+        assert soa['names']['rating'].tolist() == ['NR']
+
+    async def test_breach_reports_top_exposures_by_name(self, engine):
+        """Issuer breaches name this portfolio's largest issuers"""
+        positions = [position('A', 70.0, 'Alpha'), position('B', 20.0, 'Beta'), position('C', 10.0, 'Gamma')]
+        violations = engine._check_position_limits('PF1', {'positions': positions})
+
+        issuer_breach = next(v for v in violations if v.limit_type == 'single_issuer')
+        assert [exposure['issuer'] for exposure in issuer_breach.top_exposures] == ['Alpha', 'Beta', 'Gamma']
+        assert issuer_breach.top_exposures[0]['percentage'] == pytest.approx(0.7)
+
+def named_totals(aggregates, dimension):
+    values = getattr(aggregates, f'by_{dimension}')
+    return {name: value for name, value in zip(aggregates.names[dimension], values) if abs(value) > 1e-6}
+
+@pytest.mark.asyncio
+class TestMaintainedPositionState:
+
+    async def test_updates_match_full_recompute(self, engine):
+        """Aggregates kept by position updates equal a recompute over the resulting positions"""
+        rng = random.Random(11)
+        positions = {
+            f'S{i}': position(f'S{i}', rng.uniform(1, 100), f'Issuer {i % 4}', f'Sector {i % 3}',
+                              rng.choice(['AAA', 'AA', 'A']), rng.random())
+            for i in range(12)
+        }
+        engine._check_position_limits('PF1', {'positions': list(positions.values())})
+
+        for step in range(200):
+            symbol = f'S{rng.randrange(16)}'
+            market_value = 0.0 if rng.random() < 0.15 else rng.uniform(1, 100)
+            update = position(symbol, market_value, f'Issuer {rng.randrange(6)}', f'Sector {rng.randrange(5)}',
+                              rng.choice(['AAA', 'AA', 'A', 'BBB']), rng.random())
+            update['maturity_date'] = rng.choice([None, '2027-06-30', '2040-01-01'])
+            assert await engine.apply_position_update('PF1', update) is not None
+            if market_value:
+                positions[symbol] = update
+            else:
+                positions.pop(symbol, None)
+
+        maintained = engine._position_states['PF1'].aggregates
+        expected = engine._aggregate_positions(engine._positions_soa(list(positions.values())))
+        assert maintained.total == pytest.approx(expected.total)
+        assert maintained.liquid == pytest.approx(expected.liquid)
+        for dimension in ('issuer', 'sector', 'rating'):
+            assert named_totals(maintained, dimension) == pytest.approx(named_totals(expected, dimension))
+        np.testing.assert_allclose(maintained.by_maturity_bucket, expected.by_maturity_bucket, atol=1e-6)
+
+    async def test_update_reports_new_breach(self, engine):
+        """A position update that concentrates an issuer is flagged immediately"""
+        positions = [position(f'S{i}', 10.0, f'Issuer {i}', f'Sector {i}', ('AAA', 'AA', 'A')[i % 3]) for i in range(10)]
+        assert engine._check_position_limits('PF1', {'positions': positions}) == []
+
+        violations = await engine.apply_position_update('PF1', position('S0', 50.0, 'Issuer 0', 'Sector 0', 'AAA'))
+
+        issuer_breach = next(v for v in violations if v.limit_type == 'single_issuer')
+        assert issuer_breach.current_value == pytest.approx(50.0 / 140.0)
+        assert issuer_breach.top_exposures[0]['issuer'] == 'Issuer 0'
+        assert engine.violation_history[-1].violation is violations[-1]
+
+    async def test_update_without_state_is_not_applied(self, engine):
+        """Updates for portfolios without maintained state wait for the next sweep"""
+        assert await engine.apply_position_update('PF1', position('A', 10.0, 'Alpha')) is None
+        assert 'PF1' not in engine._position_states
+
+    async def test_sweep_skips_position_fetch_for_fresh_state(self, engine):
+        """Only portfolios without fresh maintained state have their positions fetched"""
+        fetched = []
+        fetch = engine._get_portfolio_data_batch
+
+        async def recording_fetch(portfolio_ids, position_ids=None):
+            fetched.append(sorted(position_ids))
+            return await fetch(portfolio_ids, position_ids)
+
+        engine._get_portfolio_data_batch = recording_fetch
+
+        await engine.check_all_limits()
+        await engine.check_all_limits()
+        assert fetched == [['portfolio-1', 'portfolio-2', 'portfolio-3'], []]
+
+        engine._position_states['portfolio-2'].seeded_at -= engine.settings.position_state_ttl + 1
+        await engine.check_all_limits()
+        assert fetched[-1] == ['portfolio-2']
+
+    async def test_sweeps_without_position_fetch_still_flag_breaches(self, engine):
+        """Checks on maintained state report the same violations as a full recompute"""
+        await engine.check_all_limits()
+        first = len(engine.violation_history)
+        await engine.check_all_limits()
+
+        assert first > 0
+        assert len(engine.violation_history) == 2 * first
+
+    async def test_state_is_bounded_least_recently_used(self):
+        """The oldest untouched portfolio state is evicted past position_state_max"""
+        engine = LimitMonitoringEngine(make_settings(position_state_max=2))
+        await engine.initialize()
+        for portfolio_id in ('PF1', 'PF2'):
+            engine._check_position_limits(portfolio_id, {'positions': [position('A', 10.0, 'Alpha')]})
+
+        await engine.apply_position_update('PF1', position('B', 5.0, 'Beta'))
+        engine._check_position_limits('PF3', {'positions': [position('A', 10.0, 'Alpha')]})
+
+        assert list(engine._position_states) == ['PF1', 'PF3']